@@ -0,0 +1,92 @@
+"""
+Attack tables: the squares every piece attacks from every square, worked out
+once at import so move generation and attack tests only have to look them up.
+
+Squares are numbered like the engine's bitboards, sq = row * 8 + col, so a8 is
+0 and h1 is 63, and every table entry is a bitboard of target squares.
+
+Sliding pieces get one ray per direction and square, running to the edge of the
+board. When pieces stand on a ray the nearest one blocks it (the lowest bit of
+a ray running towards h1, the highest of one running towards a8), and xor'ing
+away that blocker's own ray in the same direction leaves exactly the squares up
+to and including the blocker.
+"""
+
+KNIGHT_STEPS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+KING_STEPS = [(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc]
+# (row step, col step), a white pawn moves up the board towards row 0
+PAWN_CAPTURE_STEPS = [[(-1, -1), (-1, 1)], [(1, -1), (1, 1)]]  # white, black
+ROOK_STEPS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+BISHOP_STEPS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+
+def stepTargets(sq, steps) -> int:
+    """The squares one of `steps` away from `sq` that are still on the board."""
+    r, c = divmod(sq, 8)
+    targets = 0
+    for dr, dc in steps:
+        if 0 <= r + dr < 8 and 0 <= c + dc < 8:
+            targets |= 1 << ((r + dr) * 8 + c + dc)
+    return targets
+
+
+def rayTargets(sq, dr, dc) -> int:
+    """The squares from `sq` (not included) to the edge of the board, one way."""
+    r, c = divmod(sq, 8)
+    targets = 0
+    r, c = r + dr, c + dc
+    while 0 <= r < 8 and 0 <= c < 8:
+        targets |= 1 << (r * 8 + c)
+        r, c = r + dr, c + dc
+    return targets
+
+
+def buildRays(steps) -> list:
+    """(ray from every square, does it run towards higher squares) per direction."""
+    return [
+        ([rayTargets(sq, dr, dc) for sq in range(64)], dr * 8 + dc > 0)
+        for dr, dc in steps
+    ]
+
+
+KNIGHT_ATTACKS = [stepTargets(sq, KNIGHT_STEPS) for sq in range(64)]
+KING_ATTACKS = [stepTargets(sq, KING_STEPS) for sq in range(64)]
+# indexed [color][sq], color being the engine's WHITE (0) or BLACK (1)
+PAWN_ATTACKS = [
+    [stepTargets(sq, steps) for sq in range(64)] for steps in PAWN_CAPTURE_STEPS
+]
+
+ROOK_RAYS = buildRays(ROOK_STEPS)
+BISHOP_RAYS = buildRays(BISHOP_STEPS)
+QUEEN_RAYS = ROOK_RAYS + BISHOP_RAYS
+# everything a rook or bishop could reach on an empty board, a cheap first test
+ROOK_LINES = [sum(rays[sq] for rays, _ in ROOK_RAYS) for sq in range(64)]
+BISHOP_LINES = [sum(rays[sq] for rays, _ in BISHOP_RAYS) for sq in range(64)]
+
+
+def rayAttacks(sq, direction, occupied) -> int:
+    """Squares attacked from `sq` along one direction of a *_RAYS list."""
+    rays, increasing = direction
+    attacks = rays[sq]
+    blockers = attacks & occupied
+    if blockers:
+        if increasing:
+            attacks ^= rays[(blockers & -blockers).bit_length() - 1]
+        else:
+            attacks ^= rays[blockers.bit_length() - 1]
+    return attacks
+
+
+def sliderAttacks(sq, directions, occupied) -> int:
+    """Squares attacked from `sq` along every direction in `directions`."""
+    attacks = 0
+    for rays, increasing in directions:
+        ray = rays[sq]
+        blockers = ray & occupied
+        if blockers:
+            if increasing:
+                ray ^= rays[(blockers & -blockers).bit_length() - 1]
+            else:
+                ray ^= rays[blockers.bit_length() - 1]
+        attacks |= ray
+    return attacks
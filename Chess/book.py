@@ -0,0 +1,161 @@
+"""
+Opening book: known opening moves so the AI does not have to search them.
+
+The book is a binary file of fixed-size records (position key, move id,
+weight), sorted by key. The reader memory-maps it and binary searches the
+records in place, nothing is loaded into Python objects until a key matches.
+Position keys are State.zobristKey, which comes from a fixed seed and so is
+the same in every run.
+
+    python Chess/book.py                    # data/openings.txt -> data/book.bin
+    python Chess/book.py lines.txt out.bin  # any other source or output file
+    python Chess/book.py games.pgn          # the openings of a game archive
+"""
+
+import mmap
+import os
+import random
+import struct
+import sys
+
+from engine import State, moveNotation
+from pgn import parseSAN, readGames
+
+BOOK_FILE = os.path.join("Chess", "data", "book.bin")
+OPENINGS_FILE = os.path.join("Chess", "data", "openings.txt")
+
+RECORD = struct.Struct("<QHH")  # zobrist key, move id, weight
+KEY = struct.Struct("<Q")
+PGN_PLIES = 16  # how far into every game of a PGN source the book goes
+
+
+def parseMove(gs, text):
+    """The legal move written `text` (as in moveNotation) or None."""
+    for move in gs.getValidMoves():
+        if moveNotation(move).split()[0] == text:
+            return move
+    return None
+
+
+def readLines(path):
+    """Move lists from a book source file, one variation per line, # comments."""
+    with open(path) as source:
+        for number, line in enumerate(source, 1):
+            moves = line.split("#")[0].split()
+            if moves:
+                yield number, moves
+
+
+def readPGN(path, plies=PGN_PLIES):
+    """The first `plies` moves of every game in a PGN file, like readLines.
+
+    Games from a set up position and games with a move that cannot be played
+    are left out.
+    """
+    for number, (headers, sanMoves, _) in enumerate(readGames(path), 1):
+        if headers.get("SetUp") == "1":
+            continue
+        gs = State()
+        moves = []
+        try:
+            for san in sanMoves[:plies]:
+                move = parseSAN(gs, san)
+                moves.append(moveNotation(move).split()[0])
+                gs.makeMove(move)
+        except ValueError:
+            continue
+        if moves:
+            yield number, moves
+
+
+def buildBook(lines, path=BOOK_FILE):
+    """Play through every line and write the (key, move, weight) records to `path`.
+
+    `lines` yields (line number, [move, ...]). A move that is not legal in its
+    line raises ValueError, a typo would otherwise cut the line short. Returns
+    the number of records written.
+    """
+    weights = {}
+    for number, moves in lines:
+        gs = State()
+        for text in moves:
+            move = parseMove(gs, text)
+            if move is None:
+                raise ValueError(f"line {number}: {text} is not a legal move here")
+            entry = (gs.zobristKey, move)
+            weights[entry] = weights.get(entry, 0) + 1
+            gs.makeMove(move)
+
+    with open(path, "wb") as out:
+        for (key, moveID), weight in sorted(weights.items()):
+            out.write(RECORD.pack(key, moveID, min(weight, 0xFFFF)))
+    return len(weights)
+
+
+class OpeningBook:
+    """Read-only view of a book file."""
+
+    def __init__(self, path=BOOK_FILE):
+        with open(path, "rb") as book:
+            try:
+                self.data = mmap.mmap(book.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                # empty file, or a platform without mmap (the browser build)
+                self.data = book.read()
+        self.records = len(self.data) // RECORD.size
+
+    def probe(self, key):
+        """All (moveID, weight) pairs stored for the position `key`."""
+        data = self.data
+        low, high = 0, self.records
+        while low < high:  # first record with a key >= `key`
+            middle = (low + high) // 2
+            if KEY.unpack_from(data, middle * RECORD.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        entries = []
+        while low < self.records:
+            recordKey, moveID, weight = RECORD.unpack_from(data, low * RECORD.size)
+            if recordKey != key:
+                break
+            entries.append((moveID, weight))
+            low += 1
+        return entries
+
+    def pickMove(self, gs, validMoves):
+        """A book move for the position, picked at random by weight, or None."""
+        moves = set(validMoves)
+        entries = [
+            (moveID, weight)
+            for moveID, weight in self.probe(gs.zobristKey)
+            if moveID in moves  # guards against a key collision
+        ]
+        if not entries:
+            return None
+        return random.choices(
+            [move for move, _ in entries], [weight for _, weight in entries]
+        )[0]
+
+
+openingBook = None  # opened on the first probe
+
+
+def bookMove(gs, validMoves, path=BOOK_FILE):
+    """Book move for the position, or None when out of book or there is no book."""
+    global openingBook
+    if openingBook is None:
+        try:
+            openingBook = OpeningBook(path)
+        except OSError:
+            openingBook = False  # no book file, play without one
+    return openingBook.pickMove(gs, validMoves) if openingBook else None
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    source = args[0] if args else OPENINGS_FILE
+    target = args[1] if len(args) > 1 else BOOK_FILE
+    lines = readPGN(source) if source.endswith(".pgn") else readLines(source)
+    records = buildBook(lines, target)
+    print(f"Wrote {records} records ({records * RECORD.size} bytes) to {target}")
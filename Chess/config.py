@@ -20,7 +20,24 @@ PIECESCORE = {
 
 CHECKMATE = 100000
 STALEMATE = 0
-DEPTH = 3
+KING_SAFETY_PENALTY = 30  # for a king that has left its back two rows
+DOUBLED_PAWN_PENALTY = 10  # for every extra pawn on a file
+# the AI deepens its search one ply at a time until one of these budgets runs out
+MAX_DEPTH = 32
+TIME_LIMIT = 2.0  # seconds per AI move
+NODE_LIMIT = 0  # positions per AI move, 0 for no node budget
+QUIESCENCE = True  # play out captures at the leaves instead of scoring mid-exchange
+NULL_MOVE_PRUNING = True  # cut off when even passing the turn stays above beta
+NULL_MOVE_REDUCTION = 2  # how much shallower than normal that null move is searched
+LATE_MOVE_REDUCTIONS = True  # search quiet moves ordered late one ply less at first
+LMR_FULL_DEPTH_MOVES = 3  # moves searched at full depth before reductions start
+ASPIRATION_WINDOW = 50  # each iteration first searches this far around the last score
+BATCH_LEAF_EVAL = True  # score all leaves of a frontier node in one numpy pass
+TT_SIZE_MB = 16  # transposition table size, the table never grows past this
+SEARCH_PROCESSES = 1  # >1 runs a Lazy SMP search on that many processes
+PONDER = True  # search the expected reply while the human is thinking
+OPENING_BOOK = True  # play known openings from data/book.bin without searching
+TABLEBASES = True  # play 3-4 piece endings perfectly from data/tablebases
 
 # piece-square tables for positional evaluation
 PIECE_SQUARE_TABLES = {
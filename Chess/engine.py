@@ -1,5 +1,3 @@
-import numpy as np
-
 """
     My Chess Board:
     0  bR  bN  bB  bQ  bK  bB  bN  bR
@@ -11,67 +9,338 @@ import numpy as np
     6  wp  wp  wp  wp  wp  wp  wp  wp
     7  wR  wN  wB  wQ  wK  wB  wN  wR
     -  a   b   c   d   e   f   g   h
+
+    Internally the position is kept as bitboards: one 64-bit integer per piece
+    type and colour. Square (row, col) is bit number row * 8 + col, so a8 is
+    bit 0 and h1 is bit 63. Moving "up" the board (towards row 0) is a right
+    shift by 8, moving towards the h-file is a left shift by 1.
 """
 
+import random
+from array import array
+
+from attackTables import (
+    BISHOP_LINES,
+    BISHOP_RAYS,
+    KING_ATTACKS,
+    KNIGHT_ATTACKS,
+    PAWN_ATTACKS,
+    QUEEN_RAYS,
+    ROOK_LINES,
+    ROOK_RAYS,
+    rayAttacks,
+    sliderAttacks,
+)
+from config import PIECE_SQUARE_TABLES, PIECESCORE
+
+PIECE_NAMES = ["wp", "wN", "wB", "wR", "wQ", "wK", "bp", "bN", "bB", "bR", "bQ", "bK"]
+PIECE_INDEX = {name: index for index, name in enumerate(PIECE_NAMES)}
+WHITE, BLACK = 0, 1
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+
+FULL = 0xFFFFFFFFFFFFFFFF
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+NOT_A = FULL ^ FILE_A
+NOT_H = FULL ^ FILE_H
+ROW_2 = 0xFF << 16  # black pawns land here after their first single push
+ROW_5 = 0xFF << 40  # white pawns land here after their first single push
+LAST_ROWS = 0xFF | 0xFF << 56  # pawns promote on row 0 (white) and row 7 (black)
+PROMOTION_CHOICES = ["Q", "R", "B", "N"]
+
+# Inside the engine a move is a plain int: start square | end square << 6 | flags << 12.
+# The flags say what kind of move it is, so making it needs no board lookups.
+QUIET, DOUBLE_PUSH, KING_CASTLE, QUEEN_CASTLE, CAPTURE, EN_PASSANT = 0, 1, 2, 3, 4, 5
+PROMOTION = 8  # + index into PROMOTION_CHOICES, + CAPTURE when it takes something
+NULL_MOVE = 0  # a8 to a8, never a real move: the side to move passes (makeNullMove)
+
+# castling rights are a 4-bit mask
+WHITE_KING_SIDE, WHITE_QUEEN_SIDE, BLACK_KING_SIDE, BLACK_QUEEN_SIDE = 1, 2, 4, 8
+# the rights that survive a move from or to each square: moving the king or a rook
+# off its square, or taking a rook on it, ends castling on that side
+CASTLING_KEEP = [15] * 64
+CASTLING_KEEP[60] = 15 ^ (WHITE_KING_SIDE | WHITE_QUEEN_SIDE)  # e1
+CASTLING_KEEP[4] = 15 ^ (BLACK_KING_SIDE | BLACK_QUEEN_SIDE)  # e8
+CASTLING_KEEP[56] = 15 ^ WHITE_QUEEN_SIDE  # a1
+CASTLING_KEEP[63] = 15 ^ WHITE_KING_SIDE  # h1
+CASTLING_KEEP[0] = 15 ^ BLACK_QUEEN_SIDE  # a8
+CASTLING_KEEP[7] = 15 ^ BLACK_KING_SIDE  # h8
+
+# What makeMove cannot work out backwards is kept on a history stack, two ints
+# per ply: the Zobrist key before the move and the packed word
+#   captured piece | castling rights << 4 | en passant square + 1 << 8
+#   | halfmove clock << 15
+# The captured piece is its PIECE_NAMES index, or 12 for an empty square.
+SQUARE_NAMES = PIECE_NAMES + ["."]
+SQUARE_CODES = {name: index for index, name in enumerate(SQUARE_NAMES)}
+HISTORY_PLIES = 512  # the stack starts with room for this many moves and doubles
+
+# material plus piece-square value of every piece on every square, the tables are
+# written from white's side so black reads them upside down
+PIECE_SQUARE_VALUES = [
+    [
+        PIECESCORE[name[1]]
+        + PIECE_SQUARE_TABLES[name[1]][sq // 8 if name[0] == "w" else 7 - sq // 8][sq % 8]
+        for sq in range(64)
+    ]
+    for name in PIECE_NAMES
+]
+
+# Zobrist keys: a position's key is the XOR of one random number per (piece, square),
+# plus side to move, castling rights and the en passant file. A fixed seed keeps
+# keys identical between runs, so anything saved to disk by key stays valid.
+zobristRandom = random.Random(2008)
+ZOBRIST_PIECES = [[zobristRandom.getrandbits(64) for _ in range(64)] for _ in range(12)]
+ZOBRIST_BLACK_TO_MOVE = zobristRandom.getrandbits(64)
+ZOBRIST_CASTLING = [zobristRandom.getrandbits(64) for _ in range(16)]  # one per rights mask
+ZOBRIST_ENPASSANT = [zobristRandom.getrandbits(64) for _ in range(8)]  # one per file
+
 
 class State:
     """This class represents the state of the chess game."""
 
-    def __init__(self):
-        """Initialize the chess board and pieces."""
-        self.board = np.array(
-            [
-                ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
-                ["bp", "bp", "bp", "bp", "bp", "bp", "bp", "bp"],
-                [".", ".", ".", ".", ".", ".", ".", "."],
-                [".", ".", ".", ".", ".", ".", ".", "."],
-                [".", ".", ".", ".", ".", ".", ".", "."],
-                [".", ".", ".", ".", ".", ".", ".", "."],
-                ["wp", "wp", "wp", "wp", "wp", "wp", "wp", "wp"],
-                ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"],
-            ]
-        )
+    def __init__(self, fen=None):
+        """Initialize the chess board and pieces, or the position in `fen` if given."""
+        # mailbox copy of the bitboards, the UI and Move objects read pieces from here
+        self.board = [
+            ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
+            ["bp", "bp", "bp", "bp", "bp", "bp", "bp", "bp"],
+            [".", ".", ".", ".", ".", ".", ".", "."],
+            [".", ".", ".", ".", ".", ".", ".", "."],
+            [".", ".", ".", ".", ".", ".", ".", "."],
+            [".", ".", ".", ".", ".", ".", ".", "."],
+            ["wp", "wp", "wp", "wp", "wp", "wp", "wp", "wp"],
+            ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"],
+        ]
         self.white_to_move = True  # first move is white (According to chess rules)
-        self.move_log = []  # list of moves made
+        self.move_log = []  # list of moves made, as packed ints
         self.whiteKingLoc = (7, 4)  #
         self.blackKingLoc = (0, 4)
-        # En passant target square - stores the square behind the pawn that just moved two squares
-        self.enpassant_possible = ()  # (row, col) of the square where en passant capture is possible
-        # Castling rights:
-        self.currentCastlingRights = CastleRights(
-            True, True, True, True
-        )  # initially castling is true
-        self.castleRightsLog = [
-            CastleRights(
-                self.currentCastlingRights.whiteKingSide,
-                self.currentCastlingRights.whiteQueenSide,
-                self.currentCastlingRights.blackKingSide,
-                self.currentCastlingRights.blackQueenSide,
+        # En passant target square - the square behind the pawn that just moved two
+        # squares (row * 8 + col), -1 when there is none
+        self.enpassantSq = -1
+        # Castling rights, a mask of WHITE_KING_SIDE ... BLACK_QUEEN_SIDE
+        self.castlingRights = 15  # initially castling is true
+        # plies since the last capture or pawn move, for the fifty move rule
+        self.halfmoveClock = 0
+        self.fullmoveNumber = 1  # goes up after every black move, like in FEN
+        if fen is not None:
+            self.readFEN(fen)
+        self.pieceBB = [0] * 12  # one bitboard per piece, indexed like PIECE_NAMES
+        self.colorBB = [0, 0]  # all white pieces, all black pieces
+        self.occupied = 0
+        # material + piece-square total of each side, kept up to date by putPiece/removePiece
+        self.materialScore = [0, 0]
+        for r in range(8):
+            for c in range(8):
+                if self.board[r][c] != ".":
+                    bit = 1 << (r * 8 + c)
+                    index = PIECE_INDEX[self.board[r][c]]
+                    self.pieceBB[index] |= bit
+                    self.colorBB[index // 6] |= bit
+                    self.occupied |= bit
+                    self.materialScore[index // 6] += PIECE_SQUARE_VALUES[index][r * 8 + c]
+        self.zobristKey = self.computeZobristKey()
+        # two ints for every move in move_log, see SQUARE_CODES, filled in place
+        self.history = [0] * (2 * HISTORY_PLIES)
+        # (zobristKey, valid moves, in check, status) of the last position getStatus
+        # worked out, any make/undo changes the key and so invalidates it
+        self.statusCache = None
+
+    def readFEN(self, fen) -> None:
+        """Fill the mailbox, side to move, castling rights, en passant square and move
+        counters from a FEN string like "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1"."""
+        fields = fen.split()
+        placement, side = fields[0], fields[1]
+        castling = fields[2] if len(fields) > 2 else "-"
+        enpassant = fields[3] if len(fields) > 3 else "-"
+        # the move counters are missing from EPD, which is FEN without them
+        self.halfmoveClock = int(fields[4]) if len(fields) > 4 else 0
+        self.fullmoveNumber = int(fields[5]) if len(fields) > 5 else 1
+        self.board = [["."] * 8 for _ in range(8)]
+        for r, rank in enumerate(placement.split("/")):
+            c = 0
+            for char in rank:
+                if char.isdigit():
+                    c += int(char)
+                    continue
+                piece = ("w" if char.isupper() else "b") + (
+                    "p" if char in "Pp" else char.upper()
+                )
+                self.board[r][c] = piece
+                if piece == "wK":
+                    self.whiteKingLoc = (r, c)
+                elif piece == "bK":
+                    self.blackKingLoc = (r, c)
+                c += 1
+        self.white_to_move = side == "w"
+        self.castlingRights = (
+            WHITE_KING_SIDE * ("K" in castling)
+            | WHITE_QUEEN_SIDE * ("Q" in castling)
+            | BLACK_KING_SIDE * ("k" in castling)
+            | BLACK_QUEEN_SIDE * ("q" in castling)
+        )
+        if enpassant != "-":
+            self.enpassantSq = (
+                Move.ranksToRows[enpassant[1]] * 8 + Move.filesToCols[enpassant[0]]
             )
-        ]
+
+    def getFEN(self) -> str:
+        """The position as a FEN string, the inverse of readFEN."""
+        ranks = []
+        for row in self.board:
+            rank = ""
+            empty = 0
+            for piece in row:
+                if piece == ".":
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                letter = "P" if piece[1] == "p" else piece[1]
+                rank += letter if piece[0] == "w" else letter.lower()
+            ranks.append(rank + (str(empty) if empty else ""))
+        castling = "".join(
+            letter for bit, letter in zip((1, 2, 4, 8), "KQkq") if self.castlingRights & bit
+        )
+        enpassant = "-"
+        if self.enpassantSq >= 0:
+            enpassant = (
+                Move.colsToFiles[self.enpassantSq & 7]
+                + Move.rowsToRanks[self.enpassantSq >> 3]
+            )
+        return " ".join(
+            [
+                "/".join(ranks),
+                "w" if self.white_to_move else "b",
+                castling or "-",
+                enpassant,
+                str(self.halfmoveClock),
+                str(self.fullmoveNumber),
+            ]
+        )
+
+    def computeZobristKey(self) -> int:
+        """Build the Zobrist key of the position from scratch."""
+        key = 0
+        for index in range(12):
+            pieces = self.pieceBB[index]
+            while pieces:
+                low = pieces & -pieces
+                pieces ^= low
+                key ^= ZOBRIST_PIECES[index][low.bit_length() - 1]
+        if not self.white_to_move:
+            key ^= ZOBRIST_BLACK_TO_MOVE
+        return key ^ self.getStateKey()
+
+    def getStateKey(self) -> int:
+        """Zobrist part for castling rights and en passant.
+
+        The en passant file only counts when a pawn of the side to move could
+        actually take, otherwise the same position would get two different keys.
+        """
+        key = ZOBRIST_CASTLING[self.castlingRights]
+        ep = self.enpassantSq
+        if ep >= 0:
+            us = WHITE if self.white_to_move else BLACK
+            if PAWN_ATTACKS[1 - us][ep] & self.pieceBB[us * 6 + PAWN]:
+                key ^= ZOBRIST_ENPASSANT[ep & 7]
+        return key
+
+    def isRepetition(self) -> bool:
+        """Has the current position already occurred in this game?
+
+        Only positions since the last capture or pawn move, with the same side
+        to move, can be the same, so only every other of those keys is checked.
+        """
+        key = self.zobristKey
+        history = self.history
+        ply = len(self.move_log)
+        first = max(ply - self.halfmoveClock, 0)
+        for i in range(2 * ply - 4, 2 * first - 1, -4):
+            if history[i] == key:
+                return True
+        return False
+
+    def repetitionCount(self) -> int:
+        """How often the current position occurred before, 2 makes it a threefold."""
+        key = self.zobristKey
+        history = self.history
+        ply = len(self.move_log)
+        first = max(ply - self.halfmoveClock, 0)
+        return sum(history[i] == key for i in range(2 * ply - 4, 2 * first - 1, -4))
+
+    def putPiece(self, r, c, piece) -> None:
+        """Place `piece` on an empty square, keeping mailbox and bitboards in sync."""
+        bit = 1 << (r * 8 + c)
+        index = PIECE_INDEX[piece]
+        self.board[r][c] = piece
+        self.zobristKey ^= ZOBRIST_PIECES[index][r * 8 + c]
+        self.pieceBB[index] |= bit
+        self.colorBB[index // 6] |= bit
+        self.occupied |= bit
+        self.materialScore[index // 6] += PIECE_SQUARE_VALUES[index][r * 8 + c]
+
+    def removePiece(self, r, c) -> str:
+        """Lift the piece off (r, c) and return it."""
+        piece = self.board[r][c]
+        bit = 1 << (r * 8 + c)
+        index = PIECE_INDEX[piece]
+        self.board[r][c] = "."
+        self.zobristKey ^= ZOBRIST_PIECES[index][r * 8 + c]
+        self.pieceBB[index] ^= bit
+        self.colorBB[index // 6] ^= bit
+        self.occupied ^= bit
+        self.materialScore[index // 6] -= PIECE_SQUARE_VALUES[index][r * 8 + c]
+        return piece
 
     def makeMove(self, move) -> None:
-        """Make a move on the board."""
-        self.board[move.startRow][move.startCol] = "."  # initial square has to be empty
-        # move the piece to the new square
-        self.board[move.endRow][move.endCol] = move.pieceMoved
+        """Make a move (a packed int from getValidMoves) on the board."""
+        start, end, flags = move & 63, move >> 6 & 63, move >> 12
+        startRow, startCol = start >> 3, start & 7
+        endRow, endCol = end >> 3, end & 7
+        captured = self.board[endRow][endCol]
+        # everything undoMove cannot work out backwards goes on the history stack
+        history = self.history
+        i = 2 * len(self.move_log)
+        if i == len(history):
+            history.extend([0] * len(history))
+        history[i] = self.zobristKey
+        history[i + 1] = (
+            SQUARE_CODES[captured]
+            | self.castlingRights << 4
+            | (self.enpassantSq + 1) << 8
+            | self.halfmoveClock << 15
+        )
+        oldStateKey = self.getStateKey()  # putPiece/removePiece take care of the piece keys
+        piece = self.removePiece(startRow, startCol)  # initial square has to be empty
+        if captured != ".":
+            self.removePiece(endRow, endCol)
+        if piece[1] == "p" or captured != ".":
+            self.halfmoveClock = 0
+        else:
+            self.halfmoveClock += 1
+        if piece[0] == "b":
+            self.fullmoveNumber += 1
+        # move the piece to the new square (pawn promotion: pawn becomes the chosen piece)
+        if flags & PROMOTION:
+            self.putPiece(endRow, endCol, piece[0] + PROMOTION_CHOICES[flags & 3])
+        else:
+            self.putPiece(endRow, endCol, piece)
         self.move_log.append(move)  # for history of moves
         self.white_to_move = not self.white_to_move  # swapping players
 
         # if king is moved take the record of the new positions of the king
-        if move.pieceMoved == "wK":
-            self.whiteKingLoc = (move.endRow, move.endCol)
-        elif move.pieceMoved == "bK":
-            self.blackKingLoc = (move.endRow, move.endCol)
-
-        # pawn promotion:
-        if move.isPawnPromotion:
-            self.board[move.endRow][move.endCol] = move.pieceMoved[0] + "Q"
+        if piece == "wK":
+            self.whiteKingLoc = (endRow, endCol)
+        elif piece == "bK":
+            self.blackKingLoc = (endRow, endCol)
 
         # En passant move handling
-        if move.isEnpassantMove:
+        if flags == EN_PASSANT:
             # Remove the captured pawn (which is not on the end square)
-            self.board[move.startRow][move.endCol] = "."  # Remove the captured pawn
+            self.removePiece(startRow, endCol)
 
         # Update en passant possibility
 
@@ -82,205 +351,193 @@ class State:
                    . . . . .   ->  . . . . .  -> . . P1 . .
                    . P1 . . .      . P1 P2 .     . . . . .
         """
-        if move.pieceMoved[1] == "p" and abs(move.startRow - move.endRow) == 2:
-            self.enpassant_possible = (
-                (move.startRow + move.endRow) // 2,
-                move.startCol,  # col remains the same
-            )
+        if flags == DOUBLE_PUSH:
+            self.enpassantSq = (start + end) >> 1  # the square in between
         else:
-            self.enpassant_possible = ()
+            self.enpassantSq = -1
 
         # castle moves:
-        if move.isCastleMove:
-            # king side castle:
-            if move.endCol - move.startCol == 2:
-                # copies rook to new position
-                self.board[move.endRow][move.endCol - 1] = self.board[move.endRow][
-                    move.endCol + 1
-                ]
-                # remove it from previous position
-                self.board[move.endRow][move.endCol + 1] = "."
-            # Queen side castle:
-            else:
-                self.board[move.endRow][move.endCol + 1] = self.board[move.endRow][
-                    move.endCol - 2
-                ]
-                self.board[move.endRow][move.endCol - 2] = "."
+        if flags == KING_CASTLE:
+            # king side castle: rook jumps from h-file to f-file
+            rook = self.removePiece(endRow, endCol + 1)
+            self.putPiece(endRow, endCol - 1, rook)
+        elif flags == QUEEN_CASTLE:
+            # Queen side castle: rook jumps from a-file to d-file
+            rook = self.removePiece(endRow, endCol - 2)
+            self.putPiece(endRow, endCol + 1, rook)
         # updating the castling rights - If the king or rook has moved for once the castling rights will be vanished away.
-        self.updateCastleRights(move)
-        self.castleRightsLog.append(
-            CastleRights(
-                self.currentCastlingRights.whiteKingSide,
-                self.currentCastlingRights.whiteQueenSide,
-                self.currentCastlingRights.blackKingSide,
-                self.currentCastlingRights.blackQueenSide,
-            )
+        self.castlingRights &= CASTLING_KEEP[start] & CASTLING_KEEP[end]
+        self.zobristKey ^= oldStateKey ^ self.getStateKey() ^ ZOBRIST_BLACK_TO_MOVE
+
+    def makeNullMove(self) -> None:
+        """Pass the turn without moving, for null move pruning in the search.
+
+        Positions before a null move cannot repeat after it, so the halfmove
+        clock starts again. undoNullMove takes it back.
+        """
+        history = self.history
+        i = 2 * len(self.move_log)
+        if i == len(history):
+            history.extend([0] * len(history))
+        history[i] = self.zobristKey
+        history[i + 1] = (
+            SQUARE_CODES["."]
+            | self.castlingRights << 4
+            | (self.enpassantSq + 1) << 8
+            | self.halfmoveClock << 15
         )
-        #
+        oldStateKey = self.getStateKey()
+        self.move_log.append(NULL_MOVE)
+        self.white_to_move = not self.white_to_move
+        self.enpassantSq = -1
+        self.halfmoveClock = 0
+        self.zobristKey ^= oldStateKey ^ self.getStateKey() ^ ZOBRIST_BLACK_TO_MOVE
+
+    def undoNullMove(self) -> None:
+        self.move_log.pop()
+        i = 2 * len(self.move_log)
+        record = self.history[i + 1]
+        self.white_to_move = not self.white_to_move
+        self.enpassantSq = (record >> 8 & 127) - 1
+        self.halfmoveClock = record >> 15
+        self.zobristKey = self.history[i]
 
     def undoMove(self) -> None:
         """Undo the last move."""
         # atleast move_log has to have something for deletion.
         if len(self.move_log) != 0:
             move = self.move_log.pop()  # get the last move
-            self.board[move.startRow][move.startCol] = move.pieceMoved
-            self.board[move.endRow][
-                move.endCol
-            ] = (
-                move.pieceCaptured
-            )  # initially pieceCaptured was empty bro so don't think of that case.
+            start, end, flags = move & 63, move >> 6 & 63, move >> 12
+            startRow, startCol = start >> 3, start & 7
+            endRow, endCol = end >> 3, end & 7
+            piece = self.removePiece(endRow, endCol)
+            if flags & PROMOTION:
+                piece = piece[0] + "p"  # the promoted piece goes back to being a pawn
+            self.putPiece(startRow, startCol, piece)
+            i = 2 * len(self.move_log)
+            record = self.history[i + 1]
+            captured = SQUARE_NAMES[record & 15]
+            if captured != ".":
+                # initially pieceCaptured was empty bro so don't think of that case.
+                self.putPiece(endRow, endCol, captured)
+            # castling rights, en passant square and halfmove clock from before the move
+            self.castlingRights = record >> 4 & 15
+            self.enpassantSq = (record >> 8 & 127) - 1
+            self.halfmoveClock = record >> 15
+            if piece[0] == "b":
+                self.fullmoveNumber -= 1
             self.white_to_move = (
                 not self.white_to_move
             )  # now change the player dude to undo other player's move.
 
             # Restore king position: Badshah ko alag se sahi rakhna padega bro. Nahi to destruction🔥
-            if move.pieceMoved == "wK":
-                self.whiteKingLoc = (move.startRow, move.startCol)
-            elif move.pieceMoved == "bK":
-                self.blackKingLoc = (move.startRow, move.startCol)
+            if piece == "wK":
+                self.whiteKingLoc = (startRow, startCol)
+            elif piece == "bK":
+                self.blackKingLoc = (startRow, startCol)
 
             # handling en passant undo
-            if move.isEnpassantMove:
-                # Restore the captured pawn
-                captured_pawn = "bp" if move.pieceMoved[0] == "w" else "wp"
-                self.board[move.startRow][
-                    move.endCol
-                ] = captured_pawn  # can use any col both will be same.
-                # Fix: The captured pawn should be placed at the correct location
-                self.board[move.endRow][move.endCol] = "."
-
-            # Restore en passant possibility from previous move
-            if len(self.move_log) > 0:
-                prev_move = self.move_log[-1]  # check from back bro.
-                if (
-                    prev_move.pieceMoved[1] == "p"
-                    and abs(prev_move.startRow - prev_move.endRow) == 2
-                ):
-                    self.enpassant_possible = (
-                        (prev_move.startRow + prev_move.endRow) // 2,
-                        prev_move.startCol,
-                    )
-                else:
-                    self.enpassant_possible = ()
-            else:
-                self.enpassant_possible = ()
-
-            # undo the castling rights:
-            self.castleRightsLog.pop()  # pop the recent rights to undo
-            # set currentCastleRights = last one.
-            if len(self.castleRightsLog) > 0:
-                self.currentCastlingRights = self.castleRightsLog[-1]
-            else:
-                self.currentCastlingRights = CastleRights(True, True, True, True)
+            if flags == EN_PASSANT:
+                # Restore the captured pawn, it sits beside the start square and not on the end square
+                captured_pawn = "bp" if piece[0] == "w" else "wp"
+                self.putPiece(startRow, endCol, captured_pawn)
 
             # undo castle moves:
-            if move.isCastleMove:
-                if move.endCol - move.startCol == 2:  # king side castle
-                    self.board[move.endRow][move.endCol + 1] = self.board[move.endRow][
-                        move.endCol - 1
-                    ]
-                    self.board[move.endRow][move.endCol - 1] = "."
-                else:  # Queen side castle
-                    self.board[move.endRow][move.endCol - 2] = self.board[move.endRow][
-                        move.endCol + 1
-                    ]
-                    self.board[move.endRow][move.endCol + 1] = "."
-            
+            if flags == KING_CASTLE:
+                rook = self.removePiece(endRow, endCol - 1)
+                self.putPiece(endRow, endCol + 1, rook)
+            elif flags == QUEEN_CASTLE:
+                rook = self.removePiece(endRow, endCol + 1)
+                self.putPiece(endRow, endCol - 2, rook)
+
+            # putPiece/removePiece kept xoring the key above, the stack hands back the exact value
+            self.zobristKey = self.history[i]
+
             #TODO: logic for undoing check.
-            
-
-    # update castle rights:
-    def updateCastleRights(self, move):
-        """Updating the castling rights in given moves"""
-        # if pieceMoved is a king. No possibility of castling in any circumstances.
-        if move.pieceMoved == "wK":
-            self.currentCastlingRights.whiteKingSide = False
-            self.currentCastlingRights.whiteQueenSide = False
-        elif move.pieceMoved == "bK":
-            self.currentCastlingRights.blackKingSide = False
-            self.currentCastlingRights.blackQueenSide = False
-
-        # if rook is 'the' pieceMoved.
-        elif move.pieceMoved == "wR":
-            if move.startRow == 7:
-                if move.startCol == 0:  # left rook
-                    self.currentCastlingRights.whiteQueenSide = False
-                elif move.startCol == 7:  # right rook
-                    self.currentCastlingRights.whiteKingSide = False
-
-        elif move.pieceMoved == "bR":
-            if move.startRow == 0:
-                if move.startCol == 0:  # left rook
-                    self.currentCastlingRights.blackQueenSide = False
-                elif move.startCol == 7:  # right rook
-                    self.currentCastlingRights.blackKingSide = False
-
-        # Also update castling rights when a rook is captured
-        if move.pieceCaptured == "wR":
-            if move.endRow == 7:
-                if move.endCol == 0:  # left rook captured
-                    self.currentCastlingRights.whiteQueenSide = False
-                elif move.endCol == 7:  # right rook captured
-                    self.currentCastlingRights.whiteKingSide = False
-        elif move.pieceCaptured == "bR":
-            if move.endRow == 0:
-                if move.endCol == 0:  # left rook captured
-                    self.currentCastlingRights.blackQueenSide = False
-                elif move.endCol == 7:  # right rook captured
-                    self.currentCastlingRights.blackKingSide = False
+
 
     # All pseudo moves of the pieces
-    def getAllPseudoLegalMoves(self) -> list:
+    def getAllPseudoLegalMoves(self) -> array:
         # here we are just exploring all the moves possible.
         # Later will be optimising for valid moves only.
-        moves = []
-        for r in range(8):
-            for c in range(8):
-                piece = self.board[r][c]
-                if piece != "." and (
-                    piece[0] == "w" if self.white_to_move else piece[0] == "b"
-                ):
-                    piece_moves = self.getPieceMoves(r, c)
-                    for start, end in piece_moves:
-                        moves.append(Move(start, end, self.board))
-
+        moves = array("H")
+        self.getPawnMoves(moves)
+        self.getKnightMoves(moves)
+        self.getBishopMoves(moves)
+        self.getRookMoves(moves)
+        self.getQueenMoves(moves)
+        self.getKingMoves(moves)
         return moves
 
     # going for move selection and validation
-    def getValidMoves(self) -> list:
-        """Get all valid Move objects for the current player."""
-        tempCastlingRights = CastleRights(
-            self.currentCastlingRights.whiteKingSide,
-            self.currentCastlingRights.whiteQueenSide,
-            self.currentCastlingRights.blackKingSide,
-            self.currentCastlingRights.blackQueenSide,
-        )
-        # getting first all the pseudo moves.
-        moves = self.getAllPseudoLegalMoves()
+    def getValidMoves(self, capturesOnly=False) -> array:
+        """Get all valid moves for the current player, as an array of packed ints.
 
-        # just done here to avoid infinite recursion
-        if self.white_to_move:
-            self.getCastleMoves(self.whiteKingLoc[0], self.whiteKingLoc[1], moves)
-        else:
-            self.getCastleMoves(self.blackKingLoc[0], self.blackKingLoc[1], moves)
-        # the trick is to move backwards through the moves and check if the king is in check after making each move -> moving backwards helps to avoid cases when we iterate through the list and remove elements from it and can't access the next element as it is shifted to the left
-        for i in range(len(moves) - 1, -1, -1):
-
-            # NERD approach
-            # TODO: Will modify this approach for better performance
-            self.makeMove(moves[i])
-            self.white_to_move = (
-                not self.white_to_move
-            )  # generate all the moves for the opponent first and check the positions where opponents can attack the king of current player
+        Checkers and pinned pieces are worked out once for the position and every
+        generator is masked with them, so only legal moves are ever produced.
+        With `capturesOnly` the targets are further limited to enemy pieces (plus
+        en passant), which is what the quiescence search looks at.
+        """
+        moves = array("H")
+        us = WHITE if self.white_to_move else BLACK
+        king = self.pieceBB[us * 6 + KING]
+        checkers, checkMask, pinned, pinRays = self.getChecksAndPins(king, us)
+        captureMask = self.colorBB[1 - us] if capturesOnly else FULL
+        self.getKingMoves(moves, legalOnly=True, allowed=captureMask)
+        if checkers & (checkers - 1):
+            return moves  # double check: only the king can move
+
+        # out of check the moves have to capture the checker or block its ray
+        allowed = (checkMask if checkers else FULL) & captureMask
+        self.getPawnMoves(moves, allowed, pinned, pinRays)
+        self.getKnightMoves(moves, allowed, pinned)
+        self.getBishopMoves(moves, allowed, pinned, pinRays)
+        self.getRookMoves(moves, allowed, pinned, pinRays)
+        self.getQueenMoves(moves, allowed, pinned, pinRays)
+        if not checkers and not capturesOnly:
+            r, c = divmod(king.bit_length() - 1, 8)
+            self.getCastleMoves(r, c, moves)
+        return moves
 
-            if self.inCheck():
-                moves.remove(moves[i])
-            self.white_to_move = not self.white_to_move
+    def getChecksAndPins(self, king, us) -> tuple:
+        """Find the pieces giving check to `king` and the pieces pinned against it.
 
-            # now undo the move to restore the board state
-            self.undoMove()
-        self.currentCastlingRights = tempCastlingRights
-        return moves
+        Returns (checkers, checkMask, pinned, pinRays). checkMask holds the checkers
+        plus the squares between a sliding checker and the king, pinRays maps each
+        pinned square to the line it may still move along (pinner included).
+        """
+        them = 1 - us
+        base = them * 6
+        occupied = self.occupied
+        own = self.colorBB[us]
+        kingSq = king.bit_length() - 1
+        checkers = (KNIGHT_ATTACKS[kingSq] & self.pieceBB[base + KNIGHT]) | (
+            PAWN_ATTACKS[us][kingSq] & self.pieceBB[base + PAWN]
+        )
+        checkMask = checkers
+        pinned = 0
+        pinRays = {}
+        queens = self.pieceBB[base + QUEEN]
+        rooks = (self.pieceBB[base + ROOK] | queens) & ROOK_LINES[kingSq]
+        bishops = (self.pieceBB[base + BISHOP] | queens) & BISHOP_LINES[kingSq]
+        for directions, sliders in ((ROOK_RAYS, rooks), (BISHOP_RAYS, bishops)):
+            if not sliders:
+                continue
+            for direction in directions:
+                if not direction[0][kingSq] & sliders:
+                    continue  # no slider on this line at all, so no check or pin
+                ray = rayAttacks(kingSq, direction, occupied)
+                blocker = ray & occupied
+                if blocker & sliders:
+                    checkers |= blocker
+                    checkMask |= ray
+                elif blocker & own:
+                    # one of ours is in the way, is there an enemy slider right behind it?
+                    beyond = rayAttacks(blocker.bit_length() - 1, direction, occupied)
+                    if beyond & occupied & sliders:
+                        pinned |= blocker
+                        pinRays[blocker.bit_length() - 1] = ray | beyond
+        return checkers, checkMask, pinned, pinRays
 
     def inCheck(self) -> bool:
         # check for those squares which can be attacked to conquer the king of particular side
@@ -292,229 +549,232 @@ class State:
             return self.squareUnderAttack(self.blackKingLoc[0], self.blackKingLoc[1])
 
     def squareUnderAttack(self, r, c) -> bool:
-        # this is very obvious code bro.
-
-        self.white_to_move = not self.white_to_move  # toggle the players
-        opponent_moves = self.getAllPseudoLegalMoves()
-        self.white_to_move = not self.white_to_move
+        """Is (r, c) attacked by the opponent of the side to move?"""
+        return self.isAttacked(r * 8 + c, BLACK if self.white_to_move else WHITE)
 
-        for move in opponent_moves:
-            if move.endRow == r and move.endCol == c:
-                return True
+    def isAttacked(self, sq, attacker) -> bool:
+        """Look outward from `sq` for any piece of colour `attacker` that hits it.
 
+        Each piece type is checked by putting that piece on `sq` and seeing whether
+        its attacks land on an enemy piece of the same type, cheapest tests first.
+        """
+        base = attacker * 6
+        pieceBB = self.pieceBB
+        if KNIGHT_ATTACKS[sq] & pieceBB[base + KNIGHT]:
+            return True
+        # pawns attack diagonally forward, so look diagonally backward from sq
+        if PAWN_ATTACKS[1 - attacker][sq] & pieceBB[base + PAWN]:
+            return True
+        if KING_ATTACKS[sq] & pieceBB[base + KING]:
+            return True
+        # only sliders standing on one of sq's lines can reach it at all
+        queens = pieceBB[base + QUEEN]
+        rooks = (pieceBB[base + ROOK] | queens) & ROOK_LINES[sq]
+        if rooks and sliderAttacks(sq, ROOK_RAYS, self.occupied) & rooks:
+            return True
+        bishops = (pieceBB[base + BISHOP] | queens) & BISHOP_LINES[sq]
+        if bishops and sliderAttacks(sq, BISHOP_RAYS, self.occupied) & bishops:
+            return True
         return False
 
     def checkMate(self) -> str:
-        if not self.getValidMoves():  # if no valid moves available
-            if (
-                self.inCheck()
-            ):  # either it will be a checkmate or stalemate if still there's a check
-                return "checkmate"
-            else:
-                return "stalemate"
-        elif (
-            self.inCheck()
-        ):  # if valid moves available and in check ask the player to shut mind off and move his required move
-            return "check"
-        else:
-            return "play"  # already in good position bro, just play your game.
-
-    def getPieceMoves(self, r, c) -> list:
-        """Get all valid moves for a piece."""
-        piece = self.board[r][c]
-        if piece[1] == "p":
-            return self.getPawnMoves(r, c)
-        elif piece[1] == "R":
-            return self.getRookMoves(r, c)
-        elif piece[1] == "N":
-            return self.getKnightMoves(r, c)
-        elif piece[1] == "B":
-            return self.getBishopMoves(r, c)
-        elif piece[1] == "Q":
-            return self.getQueenMoves(r, c)
-        elif piece[1] == "K":
-            return self.getKingMoves(r, c)
-        return []
-
-    def getPawnMoves(self, r, c) -> list:
-        """Get all valid moves for a pawn."""
-        moves = []
-        direction = (
-            -1 if self.white_to_move else 1
-        )  # white pawn will move up the board, hence -1, # black pawn will move down the board, hence 1
-        start_row = (
-            6 if self.white_to_move else 1
-        )  # starting row for white pawn is 6, black pawn is 1
-
-        # Forward moves
-        if 0 <= r + direction < 8 and self.board[r + direction][c] == ".":
-            moves.append(((r, c), (r + direction, c)))  # can move one square forward
-            # Two square move from starting position
-            if r == start_row and self.board[r + 2 * direction][c] == ".":
-                moves.append(
-                    ((r, c), (r + 2 * direction, c))
-                )  # can move two squares from starting position but only once
-
-        # Diagonal captures
-        for dc in [-1, 1]:  # Check both diagonal directions
-            if 0 <= c + dc < 8 and 0 <= r + direction < 8:
-                target = self.board[r + direction][c + dc]
-                if target != "." and target[0] != self.board[r][c][0]:
-                    moves.append(((r, c), (r + direction, c + dc)))
-
-        # En passant capture
-        if len(self.enpassant_possible) != 0:
-            # Fix: En passant logic - the capturing pawn moves to the en passant square
-            if (
-                r == (3 if self.white_to_move else 4)
-                and abs(c - self.enpassant_possible[1]) == 1
-                and r + direction == self.enpassant_possible[0]
-            ):
-                moves.append(
-                    (
-                        (r, c),
-                        (self.enpassant_possible[0], self.enpassant_possible[1]),
-                    )
-                )
-
-        return moves
+        return self.getStatus()[2]
 
-    def getRookMoves(self, r, c) -> list:
-        """Get all valid moves for a rook."""
-        moves = []
-        directions = [
-            (1, 0),
-            (-1, 0),
-            (0, 1),
-            (0, -1),
-        ]  # vertical and horizontal -> (row, col)
-        for direction in directions:
-            for i in range(1, 8):
-                new_r = r + direction[0] * i
-                new_c = c + direction[1] * i
-                if 0 <= new_r < 8 and 0 <= new_c < 8:
-                    if self.board[new_r][new_c] == ".":
-                        moves.append(((r, c), (new_r, new_c)))  # empty square
-                    elif self.board[new_r][new_c][0] != self.board[r][c][0]:
-                        moves.append(
-                            ((r, c), (new_r, new_c))
-                        )  # if it is an enemy piece, capture it
-                        break
-                    else:
-                        break
-                else:
-                    break
-        return moves
-
-    def getKnightMoves(self, r, c) -> list:
-        """Get all valid moves for a knight."""
-        moves = []
-        knight_moves = [
-            (2, 1),
-            (2, -1),
-            (-2, 1),
-            (-2, -1),
-            (1, 2),
-            (1, -2),
-            (-1, 2),
-            (-1, -2),
-        ]
-        for move in knight_moves:
-            new_r = r + move[0]
-            new_c = c + move[1]
-            if 0 <= new_r < 8 and 0 <= new_c < 8:
-                if self.board[new_r][new_c] == ".":
-                    moves.append(((r, c), (new_r, new_c)))
-                elif self.board[new_r][new_c][0] != self.board[r][c][0]:
-                    moves.append(((r, c), (new_r, new_c)))
-        return moves
-
-    def getBishopMoves(self, r, c) -> list:
-        """Get all valid moves for a bishop."""
-        moves = []
-        directions = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
-        for direction in directions:
-            for i in range(1, 8):
-                new_r = r + direction[0] * i  # we can move ith square in the direction
-                new_c = c + direction[1] * i
-                if 0 <= new_r < 8 and 0 <= new_c < 8:
-                    if self.board[new_r][new_c] == ".":
-                        moves.append(((r, c), (new_r, new_c)))
-                    elif self.board[new_r][new_c][0] != self.board[r][c][0]:
-                        moves.append(((r, c), (new_r, new_c)))
-                        break
-                    else:
-                        break
-                else:
-                    break
-        return moves
+    def getStatus(self) -> tuple:
+        """(valid moves, in check, "checkmate"/"stalemate"/"check"/"play") of the
+        current position.
 
-    def getQueenMoves(self, r, c) -> list:
-        """Get all valid moves for a queen."""
-        moves = []
-        directions = [
-            (1, 0),
-            (-1, 0),
-            (0, 1),
-            (0, -1),
-            (1, 1),
-            (1, -1),
-            (-1, 1),
-            (-1, -1),
-        ]
-        for direction in directions:
-            for i in range(1, 8):
-                new_r = r + direction[0] * i
-                new_c = c + direction[1] * i
-                if 0 <= new_r < 8 and 0 <= new_c < 8:
-                    if self.board[new_r][new_c] == ".":
-                        moves.append(((r, c), (new_r, new_c)))
-                    elif self.board[new_r][new_c][0] != self.board[r][c][0]:
-                        moves.append(((r, c), (new_r, new_c)))
-                        break
-                    else:
-                        break
-                else:
-                    break
-        return moves
-
-    def getKingMoves(self, r, c) -> list:
-        """Get all valid moves for a king."""
-        moves = []
-        king_moves = [
-            (1, 0),
-            (-1, 0),
-            (0, 1),
-            (0, -1),
-            (1, 1),
-            (1, -1),
-            (-1, 1),
-            (-1, -1),
-        ]
-        for move in king_moves:
-            new_r = r + move[0]
-            new_c = c + move[1]
-            if 0 <= new_r < 8 and 0 <= new_c < 8:
-                if self.board[new_r][new_c] == ".":
-                    moves.append(((r, c), (new_r, new_c)))
-                elif self.board[new_r][new_c][0] != self.board[r][c][0]:
-                    moves.append(((r, c), (new_r, new_c)))
+        Worked out once per position: the UI asks every frame, and until a move is
+        made or undone the answer comes from statusCache without any move
+        generation. The move array is the cached one, do not add or remove moves.
+        """
+        cache = self.statusCache
+        if cache is not None and cache[0] == self.zobristKey:
+            return cache[1:]
+        moves = self.getValidMoves()
+        check = self.inCheck()
+        if not moves:  # if no valid moves available
+            # either it will be a checkmate or stalemate if still there's a check
+            status = "checkmate" if check else "stalemate"
+        elif check:
+            # if valid moves available and in check ask the player to shut mind off and move his required move
+            status = "check"
+        else:
+            status = "play"  # already in good position bro, just play your game.
+        self.statusCache = (self.zobristKey, moves, check, status)
+        return moves, check, status
+
+    def addMoves(self, start, targets, moves) -> None:
+        """Append a move from square `start` to every square set in `targets`."""
+        captures = targets & self.occupied  # own pieces are never in `targets`
+        targets ^= captures
+        capture = start | CAPTURE << 12
+        while captures:
+            low = captures & -captures  # lowest set bit
+            captures ^= low
+            moves.append(capture | (low.bit_length() - 1) << 6)
+        while targets:
+            low = targets & -targets
+            targets ^= low
+            moves.append(start | (low.bit_length() - 1) << 6)
+
+    def addPawnMoves(self, targets, offset, moves, flags=QUIET) -> None:
+        """Append pawn moves landing on `targets`, each made from the square `offset` away.
+
+        A pawn reaching the last row gets one move per promotion piece, queen first.
+        """
+        while targets:
+            low = targets & -targets
+            targets ^= low
+            end = low.bit_length() - 1
+            move = end + offset | end << 6
+            if low & LAST_ROWS:
+                for choice in range(len(PROMOTION_CHOICES)):
+                    moves.append(move | (flags | PROMOTION + choice) << 12)
+            else:
+                moves.append(move | flags << 12)
+
+    def getPawnMoves(self, moves, allowed=FULL, pinned=0, pinRays=None) -> None:
+        """Get all valid moves for the pawns of the side to move."""
+        us = WHITE if self.white_to_move else BLACK
+        pawns = self.pieceBB[us * 6 + PAWN]
+        # free pawns go set-wise, a pinned pawn may only move along its pin ray
+        self.addPawnPushesAndCaptures(pawns & ~pinned, allowed, moves)
+        pinnedPawns = pawns & pinned
+        while pinnedPawns:
+            low = pinnedPawns & -pinnedPawns
+            pinnedPawns ^= low
+            mask = allowed & pinRays[low.bit_length() - 1]
+            self.addPawnPushesAndCaptures(low, mask, moves)
+
+        # En passant capture: the capturing pawn moves to the en passant square
+        ep = self.enpassantSq
+        if ep >= 0:
+            epBit = 1 << ep
+            attackers = PAWN_ATTACKS[1 - us][ep] & pawns
+            # the captured pawn sits beside the capturing one, right behind the en passant square
+            capturedBit = epBit << 8 if us == WHITE else epBit >> 8
+            while attackers:
+                low = attackers & -attackers
+                attackers ^= low
+                if pinRays is not None and not self.isEnpassantLegal(
+                    low, epBit, capturedBit, us
+                ):
+                    continue
+                moves.append(low.bit_length() - 1 | ep << 6 | EN_PASSANT << 12)
 
-        return moves
+    def addPawnPushesAndCaptures(self, pawns, mask, moves) -> None:
+        """Pushes and captures of `pawns` that land on `mask`."""
+        empty = FULL ^ self.occupied
+        if self.white_to_move:
+            # white pawns move up the board, towards row 0
+            enemies = self.colorBB[BLACK]
+            single = (pawns >> 8) & empty  # can move one square forward
+            double = ((single & ROW_5) >> 8) & empty  # two squares from the starting row
+            self.addPawnMoves(single & mask, 8, moves)
+            self.addPawnMoves(double & mask, 16, moves, DOUBLE_PUSH)
+            # Diagonal captures
+            self.addPawnMoves((pawns >> 9) & NOT_H & enemies & mask, 9, moves, CAPTURE)
+            self.addPawnMoves((pawns >> 7) & NOT_A & enemies & mask, 7, moves, CAPTURE)
+        else:
+            # black pawns move down the board, towards row 7
+            enemies = self.colorBB[WHITE]
+            single = (pawns << 8) & empty
+            double = ((single & ROW_2) << 8) & empty
+            self.addPawnMoves(single & mask, -8, moves)
+            self.addPawnMoves(double & mask, -16, moves, DOUBLE_PUSH)
+            self.addPawnMoves((pawns << 9) & NOT_A & enemies & mask, -9, moves, CAPTURE)
+            self.addPawnMoves((pawns << 7) & NOT_H & enemies & mask, -7, moves, CAPTURE)
+
+    def isEnpassantLegal(self, pawn, epBit, capturedBit, us) -> bool:
+        """En passant removes two pieces from one rank at once, which can expose the
+        king sideways even when neither pawn is pinned on its own. Play it on the
+        bitboards and ask whether the king is attacked afterwards."""
+        them = 1 - us
+        saved = self.occupied
+        self.occupied = saved ^ pawn ^ capturedBit ^ epBit
+        self.pieceBB[them * 6 + PAWN] ^= capturedBit
+        king = self.pieceBB[us * 6 + KING]
+        legal = not self.isAttacked(king.bit_length() - 1, them)
+        self.pieceBB[them * 6 + PAWN] ^= capturedBit
+        self.occupied = saved
+        return legal
+
+    def getOwnPieces(self, kind) -> tuple:
+        """Bitboard of the side to move's pieces of `kind`, and of all its pieces."""
+        side = WHITE if self.white_to_move else BLACK
+        return self.pieceBB[side * 6 + kind], self.colorBB[side]
+
+    def getKnightMoves(self, moves, allowed=FULL, pinned=0) -> None:
+        """Get all valid moves for the knights of the side to move."""
+        knights, own = self.getOwnPieces(KNIGHT)
+        knights &= ~pinned  # a pinned knight can never stay on its pin ray
+        while knights:
+            low = knights & -knights
+            knights ^= low
+            start = low.bit_length() - 1
+            self.addMoves(start, KNIGHT_ATTACKS[start] & ~own & allowed, moves)
+
+    def getBishopMoves(self, moves, allowed=FULL, pinned=0, pinRays=None) -> None:
+        """Get all valid moves for the bishops of the side to move."""
+        self.getSliderMoves(BISHOP, BISHOP_RAYS, moves, allowed, pinned, pinRays)
+
+    def getRookMoves(self, moves, allowed=FULL, pinned=0, pinRays=None) -> None:
+        """Get all valid moves for the rooks of the side to move."""
+        self.getSliderMoves(ROOK, ROOK_RAYS, moves, allowed, pinned, pinRays)
+
+    def getQueenMoves(self, moves, allowed=FULL, pinned=0, pinRays=None) -> None:
+        """Get all valid moves for the queens of the side to move."""
+        self.getSliderMoves(QUEEN, QUEEN_RAYS, moves, allowed, pinned, pinRays)
+
+    def getSliderMoves(
+        self, kind, directions, moves, allowed=FULL, pinned=0, pinRays=None
+    ) -> None:
+        """Sliding pieces stop at the first blocker, which they may capture if it is an enemy."""
+        pieces, own = self.getOwnPieces(kind)
+        while pieces:
+            low = pieces & -pieces
+            pieces ^= low
+            start = low.bit_length() - 1
+            targets = sliderAttacks(start, directions, self.occupied) & ~own & allowed
+            if low & pinned:
+                targets &= pinRays[start]
+            self.addMoves(start, targets, moves)
+
+    def getKingMoves(self, moves, legalOnly=False, allowed=FULL) -> None:
+        """Get all valid moves for the king of the side to move.
+
+        With `legalOnly` every target square is checked for attacks with the king
+        lifted off the board, so it cannot step back along a checking ray.
+        """
+        king, own = self.getOwnPieces(KING)
+        if not king:
+            return
+        start = king.bit_length() - 1
+        targets = KING_ATTACKS[start] & ~own & allowed
+        if legalOnly:
+            them = BLACK if self.white_to_move else WHITE
+            self.occupied ^= king
+            safe = 0
+            while targets:
+                low = targets & -targets
+                targets ^= low
+                if not self.isAttacked(low.bit_length() - 1, them):
+                    safe |= low
+            self.occupied ^= king
+            targets = safe
+        self.addMoves(start, targets, moves)
 
     # generating all valid castling moves:
     def getCastleMoves(self, r, c, moves) -> None:
         if self.squareUnderAttack(r, c):
             return  # castling not allowed if in check
 
-        if (self.white_to_move and self.currentCastlingRights.whiteKingSide) or (
-            not self.white_to_move and self.currentCastlingRights.blackKingSide
-        ):
+        rights = self.castlingRights >> (0 if self.white_to_move else 2)
+        if rights & WHITE_KING_SIDE:  # or black's, shifted onto white's bit
             self.getKingSideCastleMoves(r, c, moves)
 
-        if (self.white_to_move and self.currentCastlingRights.whiteQueenSide) or (
-            not self.white_to_move and self.currentCastlingRights.blackQueenSide
-        ):
+        if rights & WHITE_QUEEN_SIDE:
             self.getQueenSideCastleMoves(r, c, moves)
 
     def getKingSideCastleMoves(self, r, c, moves):
@@ -522,8 +782,8 @@ class State:
             if not self.squareUnderAttack(r, c + 1) and not self.squareUnderAttack(
                 r, c + 2
             ):
-                # Fix: Create Move object properly
-                moves.append(Move((r, c), (r, c + 2), self.board, isCastleMove=True))
+                start = r * 8 + c
+                moves.append(start | (start + 2) << 6 | KING_CASTLE << 12)
 
     def getQueenSideCastleMoves(self, r, c, moves):
         if (
@@ -534,21 +794,16 @@ class State:
             if not self.squareUnderAttack(r, c - 1) and not self.squareUnderAttack(
                 r, c - 2
             ):
-                # Fix: Create Move object properly
-                moves.append(Move((r, c), (r, c - 2), self.board, isCastleMove=True))
-
-
-# castling rights:
-class CastleRights:
-    def __init__(self, whiteKingSide, whiteQueenSide, blackKingSide, blackQueenSide):
-        self.whiteKingSide = whiteKingSide
-        self.whiteQueenSide = whiteQueenSide
-        self.blackKingSide = blackKingSide
-        self.blackQueenSide = blackQueenSide
+                start = r * 8 + c
+                moves.append(start | (start - 2) << 6 | QUEEN_CASTLE << 12)
 
 
 class Move:
-    """This class represents a move in chess."""
+    """This class represents a move in chess.
+
+    The engine itself only deals in packed int moves, a Move is the readable
+    version the UI works with. Its moveID is the packed int.
+    """
 
     # just a dictionary to convert between ranks and rows, files and columns
     ranksToRows = {"1": 7, "2": 6, "3": 5, "4": 4, "5": 3, "6": 2, "7": 1, "8": 0}
@@ -560,7 +815,7 @@ class Move:
         v: k for k, v in filesToCols.items()
     }  # just reversing the files and columns
 
-    def __init__(self, startSq, endSq, board, isCastleMove=False):
+    def __init__(self, startSq, endSq, board, isCastleMove=False, promotionChoice="Q"):
         self.startRow = startSq[0]  # initial position of a piece (startRow, startCol)
         self.startCol = startSq[1]
         self.endRow = endSq[0]  # final position of a piece (endRow, endCol)
@@ -574,6 +829,7 @@ class Move:
             self.pieceMoved == "bp" and self.endRow == 7
         ):
             self.isPawnPromotion = True
+        self.promotionChoice = promotionChoice  # only used when isPawnPromotion
 
         # En passant detection
         self.isEnpassantMove = False
@@ -581,12 +837,42 @@ class Move:
             if (self.endCol != self.startCol) and self.pieceCaptured == ".":
                 self.isEnpassantMove = True
 
-        # castle Move:
-        self.isCastleMove = isCastleMove
+        # castle Move: the king is the only piece that ever moves two files sideways
+        self.isCastleMove = isCastleMove or (
+            self.pieceMoved[1] == "K" and abs(self.endCol - self.startCol) == 2
+        )
 
-        # Unique ID for the move
+        # Unique ID for the move: the same packed int getValidMoves makes for it
+        if self.isPawnPromotion:
+            flags = PROMOTION + PROMOTION_CHOICES.index(promotionChoice)
+            if self.pieceCaptured != ".":
+                flags |= CAPTURE
+        elif self.isCastleMove:
+            flags = KING_CASTLE if self.endCol > self.startCol else QUEEN_CASTLE
+        elif self.isEnpassantMove:
+            flags = EN_PASSANT
+        elif self.pieceCaptured != ".":
+            flags = CAPTURE
+        elif self.pieceMoved[1] == "p" and abs(self.endRow - self.startRow) == 2:
+            flags = DOUBLE_PUSH
+        else:
+            flags = QUIET
         self.moveID = (
-            self.startRow * 1000 + self.startCol * 100 + self.endRow * 10 + self.endCol
+            self.startRow * 8 + self.startCol
+            | (self.endRow * 8 + self.endCol) << 6
+            | flags << 12
+        )
+
+    @classmethod
+    def fromID(cls, moveID, board):
+        """The Move for the packed int `moveID`, `board` is the position before it."""
+        flags = moveID >> 12
+        return cls(
+            divmod(moveID & 63, 8),
+            divmod(moveID >> 6 & 63, 8),
+            board,
+            flags in (KING_CASTLE, QUEEN_CASTLE),
+            PROMOTION_CHOICES[flags & 3] if flags & PROMOTION else "Q",
         )
 
     def __eq__(self, other):  # just for comparing the moves
@@ -601,14 +887,24 @@ class Move:
 
     # just for debugging purposes
     def getChessNotation(self) -> str:
-        # Add 'e.p.' suffix for en passant moves
-        notation = self.getRankFile(self.startRow, self.startCol) + self.getRankFile(
-            self.endRow, self.endCol
-        )
-        if self.isEnpassantMove:
-            notation += " e.p."
-        return notation
+        return moveNotation(self.moveID)
 
     def getRankFile(self, r, c) -> str:
         # convert the row and column to rank and file
         return self.colsToFiles[c] + self.rowsToRanks[r]
+
+
+def moveNotation(move) -> str:
+    """Long algebraic notation of a packed move, e.g. "e2e4", "e7e8q" or "d5e6 e.p."."""
+    start, end, flags = move & 63, move >> 6 & 63, move >> 12
+    notation = (
+        Move.colsToFiles[start & 7]
+        + Move.rowsToRanks[start >> 3]
+        + Move.colsToFiles[end & 7]
+        + Move.rowsToRanks[end >> 3]
+    )
+    if flags & PROMOTION:
+        notation += PROMOTION_CHOICES[flags & 3].lower()
+    if flags == EN_PASSANT:
+        notation += " e.p."  # Add 'e.p.' suffix for en passant moves
+    return notation
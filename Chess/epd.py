@@ -0,0 +1,160 @@
+"""
+EPD test suites: run the AI on every position of a suite and count how many it
+solves.
+
+An EPD line is the first four FEN fields followed by operations, of which the
+runner reads "bm" (the best move, or moves, in SAN), "am" (moves to avoid) and
+"id" (the position's name):
+
+    2rr3k/pp3pp1/1nnqbN1p/3pN3/2pP4/2P3Q1/PPB4P/R4RK1 w - - bm Qg6; id "WAC.001";
+
+The suite file is read a line at a time, so suites of any size work, and the
+positions can be shared out over several processes. For every position the
+report has the move played and, when solved, the time from the start of the
+search to the iteration from which on the right move stayed the best one.
+
+    python Chess/epd.py suite.epd                 # 1 second per position
+    python Chess/epd.py suite.epd --nodes 50000 --processes 4
+"""
+
+import argparse
+import multiprocessing
+import re
+import time
+
+import smartMoveFinder
+from engine import State, moveNotation
+from pgn import sanNotation
+from smartMoveFinder import findBestMove
+
+# opcode, then its operands up to the ";" (which may also sit inside quotes)
+OPERATION = re.compile(r'\s*(\w+)\s*((?:"[^"]*"|[^;"])*);?')
+
+
+def parseEPD(line) -> tuple:
+    """(FEN, operations) of one EPD line, every operation a list of operands."""
+    fields = line.split(maxsplit=4)
+    operations = {}
+    if len(fields) > 4:
+        for opcode, operands in OPERATION.findall(fields[4]):
+            operations[opcode] = [
+                operand.strip('"') for operand in re.findall(r'"[^"]*"|\S+', operands)
+            ]
+    # hmvc/fmvn are EPD's move counters, FEN carries them as the last two fields
+    halfmoves = operations.get("hmvc", ["0"])[0]
+    fullmoves = operations.get("fmvn", ["1"])[0]
+    return " ".join(fields[:4] + [halfmoves, fullmoves]), operations
+
+
+def readSuite(path):
+    """Yield (line number, EPD line) for every position in the file at `path`."""
+    with open(path) as source:
+        for number, line in enumerate(source, 1):
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield number, line
+
+
+def bare(san) -> str:
+    """SAN without check marks or annotations, "Qxf7+!" -> "Qxf7"."""
+    return san.rstrip("+#!?")
+
+
+def isSolution(san, notation, operations) -> bool:
+    """Does the move (as SAN and as "e2e4" notation) answer the position's bm/am?"""
+    names = {bare(san), notation}
+    if "bm" in operations:
+        return any(bare(best) in names for best in operations["bm"])
+    return not any(bare(avoid) in names for avoid in operations.get("am", []))
+
+
+def solvePosition(job) -> dict:
+    """Search one position, `job` is (line number, EPD line, time limit, node limit)."""
+    number, line, timeLimit, nodeLimit = job
+    fen, operations = parseEPD(line)
+    gs = State(fen)
+    moves = gs.getValidMoves()
+    start = time.perf_counter()
+    solvedAt = None  # when the search settled on a right move
+
+    def iterationDone(depth, move, score):
+        nonlocal solvedAt
+        if isSolution(sanNotation(gs, move), moveNotation(move), operations):
+            if solvedAt is None:
+                solvedAt = time.perf_counter() - start
+        else:
+            solvedAt = None
+
+    smartMoveFinder.iterationHook = iterationDone
+    smartMoveFinder.transposition_table.clear()  # every position is searched afresh
+    try:
+        move = findBestMove(gs, moves, timeLimit, nodeLimit, processes=1, verbose=False)
+    finally:
+        smartMoveFinder.iterationHook = None
+    seconds = time.perf_counter() - start
+
+    san = sanNotation(gs, move) if move is not None else "(none)"
+    solved = move is not None and isSolution(san, moveNotation(move), operations)
+    if solved and solvedAt is None:
+        solvedAt = seconds  # answered without a search, or right only at the end
+    return {
+        "id": operations.get("id", [f"line {number}"])[0],
+        "move": san,
+        "expected": " ".join(operations.get("bm", []))
+        or "not " + " ".join(operations.get("am", [])),
+        "solved": solved,
+        "solveTime": solvedAt if solved else None,
+        "seconds": seconds,
+        "nodes": smartMoveFinder.counter,
+    }
+
+
+def runSuite(path, timeLimit, nodeLimit=0, processes=1, verbose=False) -> tuple:
+    """Run every position of the suite at `path`, print the results.
+
+    Returns (positions solved, positions tried).
+    """
+    jobs = ((number, line, timeLimit, nodeLimit) for number, line in readSuite(path))
+    solved = tried = nodes = 0
+    seconds = solveTime = 0.0
+    pool = multiprocessing.Pool(processes) if processes > 1 else None
+    try:
+        results = pool.imap(solvePosition, jobs) if pool else map(solvePosition, jobs)
+        for result in results:
+            tried += 1
+            nodes += result["nodes"]
+            seconds += result["seconds"]
+            if result["solved"]:
+                solved += 1
+                solveTime += result["solveTime"]
+            if verbose or not result["solved"]:
+                outcome = (
+                    f"solved in {result['solveTime']:.2f}s"
+                    if result["solved"]
+                    else f"failed, expected {result['expected']}"
+                )
+                print(f"  {result['id']}: {result['move']} {outcome}")
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    print(
+        f"Solved {solved}/{tried} ({solved / max(tried, 1):.1%}), "
+        f"average time to solution {solveTime / max(solved, 1):.2f}s, "
+        f"{nodes / max(seconds, 1e-9):.0f} nodes/s per process"
+    )
+    return solved, tried
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the AI on an EPD test suite.")
+    parser.add_argument("suite", help="EPD file, one position a line")
+    parser.add_argument("--time", type=float, default=1.0, help="seconds per position")
+    parser.add_argument("--nodes", type=int, default=0, help="node limit, 0 for none")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument(
+        "--verbose", action="store_true", help="also list the solved positions"
+    )
+    args = parser.parse_args()
+    runSuite(args.suite, args.time, args.nodes, args.processes, args.verbose)
@@ -1,11 +1,13 @@
 import asyncio
+import sys
 import time
 
 import pygame as p
-from config import DIMENSION, HEIGHT, MAX_FPS, SQUARE_SIZE, WIDTH
+from config import DIMENSION, HEIGHT, MAX_FPS, PONDER, SQUARE_SIZE, WIDTH
 from engine import Move, State
+from ponder import Ponderer
 from smartMoveFinder import findBestMove, findRandomMove
-from ui import animate_move, draw_game_state, load_images
+from ui import BoardRenderer, load_images
 
 
 async def main() -> None:
@@ -17,7 +19,8 @@ async def main() -> None:
     clock = p.time.Clock()
     gs = State()
     images = load_images()
-    validMoves = gs.getValidMoves()
+    renderer = BoardRenderer(screen, images)
+    validMoves = gs.getStatus()[0]
     moveMade = False
 
     sqSelected = ()
@@ -27,6 +30,9 @@ async def main() -> None:
     playerOne = True  # True for humans and False for AI
     playerTwo = False  # initially AI move will be False
     gameOver = False
+    # think on the human's time, the browser build has no threads for it
+    pondering = PONDER and sys.platform != "emscripten"
+    ponderer = Ponderer()
 
     while running:
         humanTurn = (gs.white_to_move and playerOne) or (
@@ -35,6 +41,8 @@ async def main() -> None:
         for e in p.event.get():
             if e.type == p.QUIT:
                 running = False
+            elif e.type == p.VIDEOEXPOSE:
+                renderer.invalidate()  # the window was covered, draw all of it again
             elif e.type == p.MOUSEBUTTONDOWN:
                 if not gameOver and humanTurn:
                     loc = p.mouse.get_pos()
@@ -55,14 +63,12 @@ async def main() -> None:
                     else:
                         # Second click - attempt to make a move
                         move = Move(playerClicks[0], (row, col), gs.board)
-                        for validMove in validMoves:
-                            if move == validMove:
-                                animate_move(screen, gs.board, images, move, gs, clock)
-                                gs.makeMove(validMove)
-                                moveMade = True
-                                sqSelected = ()
-                                playerClicks = []
-                                break
+                        if move.moveID in validMoves:
+                            renderer.animate_move(gs.board, move, clock)
+                            gs.makeMove(move.moveID)
+                            moveMade = True
+                            sqSelected = ()
+                            playerClicks = []
                         else:
                             # Invalid move - select new piece if clicked on own piece
                             if gs.board[row][col] != "." and gs.board[row][col][0] == (
@@ -76,6 +82,7 @@ async def main() -> None:
 
             elif e.type == p.KEYDOWN:
                 if e.key == p.K_z and not gameOver:
+                    ponderer.cancel()
                     gs.undoMove()
                     moveMade = True
                     sqSelected = ()
@@ -83,8 +90,9 @@ async def main() -> None:
                     gameOver = False  # Reset game over state when undoing
                 elif e.key == p.K_r and gameOver:
                     # Reset game when 'R' is pressed and game is over
+                    ponderer.cancel()
                     gs = State()
-                    validMoves = gs.getValidMoves()
+                    validMoves = gs.getStatus()[0]
                     sqSelected = ()
                     playerClicks = []
                     gameOver = False
@@ -93,13 +101,20 @@ async def main() -> None:
         # AI move finder:
         if not gameOver and not humanTurn:
             start_time = time.perf_counter()
-            move = findBestMove(gs, validMoves)
+            move = ponderer.finish(gs, validMoves) if pondering else None
+            if move is None:  # nothing pondered or the human played something else
+                move = findBestMove(gs, validMoves)
             if move is None:  # If no best move found, use random move
                 move = findRandomMove(validMoves)
             if move is not None:  # Check if AI found a valid move
-                animate_move(screen, gs.board, images, move, gs, clock)
+                renderer.animate_move(gs.board, Move.fromID(move, gs.board), clock)
                 gs.makeMove(move)
                 moveMade = True
+                if pondering and (
+                    (gs.white_to_move and playerOne)
+                    or (not gs.white_to_move and playerTwo)
+                ):
+                    ponderer.start(gs)
 
             end_time = time.perf_counter()
             ai_move_times.append(end_time - start_time)
@@ -108,19 +123,20 @@ async def main() -> None:
                 print(f"Average AI move time: {avg_time:.3f} seconds")
 
         if moveMade:
-            validMoves = gs.getValidMoves()
+            # one move generation per move, the frames below reuse it
+            validMoves, _, game_status = gs.getStatus()
             moveMade = False
 
             # Check for game over conditions using your existing method
-            game_status = gs.checkMate()
             if game_status == "checkmate" or game_status == "stalemate":
                 gameOver = True
 
-        draw_game_state(screen, gs.board, images, sqSelected, validMoves, gs)
+        # only the squares that changed are drawn and sent to the display
+        dirty = renderer.draw(gs.board, sqSelected, validMoves, gs)
 
         clock.tick(MAX_FPS)
         await asyncio.sleep(0)
-        p.display.flip()
+        p.display.update(dirty)
 
 
 if __name__ == "__main__":
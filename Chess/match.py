@@ -0,0 +1,266 @@
+"""
+Engine against engine matches, without a window.
+
+Two engine settings play a series of games on a process pool. Colours swap
+every game, so each opening is played once from either side. Every game is
+appended to a PGN file as soon as it finishes, and at the end the match score
+is turned into an Elo difference with a 95% error margin, next to the average
+time and nodes per move of each engine.
+
+An engine is a comma separated list of settings, "" for the defaults:
+    timeLimit=0.5, nodeLimit=20000   the budget of every move
+    MAX_DEPTH=3, QUIESCENCE=False    the eval and search settings of config.py
+                                     listed in SETTINGS
+
+    python Chess/match.py "MAX_DEPTH=3" "MAX_DEPTH=2" --games 100
+    python Chess/match.py "" "KING_SAFETY_PENALTY=0" --time 0.2 --pgn out.pgn
+"""
+
+import argparse
+import ast
+import math
+import multiprocessing
+import random
+import time
+
+import smartMoveFinder
+from config import NODE_LIMIT, TT_SIZE_MB
+from engine import PIECE_INDEX, State
+from pgn import START_FEN, formatGame, sanNotation
+from smartMoveFinder import TranspositionTable, findBestMove
+
+MAX_PLIES = 400  # a game still going after this many plies is scored a draw
+# config.py settings an engine may change, the ones smartMoveFinder reads on
+# every move. The budget comes from timeLimit/nodeLimit, the table and pool are
+# made once, and the mate scores are tied to each other, so those stay put.
+SETTINGS = [
+    "KING_SAFETY_PENALTY",
+    "DOUBLED_PAWN_PENALTY",
+    "MAX_DEPTH",
+    "QUIESCENCE",
+    "BATCH_LEAF_EVAL",
+    "NULL_MOVE_PRUNING",
+    "NULL_MOVE_REDUCTION",
+    "LATE_MOVE_REDUCTIONS",
+    "LMR_FULL_DEPTH_MOVES",
+    "ASPIRATION_WINDOW",
+    "OPENING_BOOK",
+    "TABLEBASES",
+]
+DEFAULTS = {name: getattr(smartMoveFinder, name) for name in SETTINGS}
+MINORS = [PIECE_INDEX[name] for name in ("wN", "wB", "bN", "bB")]
+
+
+def parseEngine(spec, timeLimit) -> dict:
+    """Settings of one engine from "NAME=value,..." (see the module docstring)."""
+    engine = {"timeLimit": timeLimit, "nodeLimit": NODE_LIMIT, "settings": {}}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, text = item.partition("=")
+        name = name.strip()
+        value = ast.literal_eval(text.strip())
+        if name in ("timeLimit", "nodeLimit"):
+            engine[name] = value
+        elif name in SETTINGS:
+            engine["settings"][name] = value
+        else:
+            raise ValueError(f"unknown engine setting {name!r}")
+    engine["name"] = spec or "default"
+    return engine
+
+
+def useEngine(engine, table) -> None:
+    """Switch smartMoveFinder to `engine`'s settings and transposition table."""
+    for name, value in DEFAULTS.items():
+        setattr(smartMoveFinder, name, engine["settings"].get(name, value))
+    smartMoveFinder.transposition_table = table
+
+
+def insufficientMaterial(gs) -> bool:
+    """Bare kings, or a single knight or bishop against a bare king."""
+    pieces = gs.occupied.bit_count()
+    if pieces == 2:
+        return True
+    return pieces == 3 and any(gs.pieceBB[index] for index in MINORS)
+
+
+def playGame(job) -> dict:
+    """Play one game, `job` is (index, fen, engines, seed).
+
+    engines[0] plays white in even games and black in odd ones. Returns the
+    game's PGN fields plus the time and nodes each engine spent.
+    """
+    index, fen, engines, seed = job
+    random.seed(seed)
+    players = engines if index % 2 == 0 else engines[::-1]
+    tables = [TranspositionTable(TT_SIZE_MB) for _ in players]
+    seconds = [0.0, 0.0]  # per colour
+    nodes = [0, 0]
+    moveCounts = [0, 0]
+    gs = State(fen)
+    sanMoves = []
+    result = termination = None
+    while result is None:
+        moves, check, status = gs.getStatus()
+        side = 0 if gs.white_to_move else 1
+        if status == "checkmate":
+            result = "0-1" if gs.white_to_move else "1-0"
+            termination = "checkmate"
+        elif status == "stalemate":
+            result, termination = "1/2-1/2", "stalemate"
+        elif gs.repetitionCount() >= 2:
+            result, termination = "1/2-1/2", "threefold repetition"
+        elif gs.halfmoveClock >= 100:
+            result, termination = "1/2-1/2", "fifty move rule"
+        elif insufficientMaterial(gs):
+            result, termination = "1/2-1/2", "insufficient material"
+        elif len(sanMoves) >= MAX_PLIES:
+            result, termination = "1/2-1/2", f"adjudicated after {MAX_PLIES} plies"
+        if result is not None:
+            break
+
+        engine = players[side]
+        useEngine(engine, tables[side])
+        start = time.perf_counter()
+        move = findBestMove(
+            gs,
+            moves,
+            engine["timeLimit"],
+            engine["nodeLimit"],
+            processes=1,
+            verbose=False,
+        )
+        seconds[side] += time.perf_counter() - start
+        nodes[side] += smartMoveFinder.counter
+        moveCounts[side] += 1
+
+        sanMoves.append(sanNotation(gs, move, moves))
+        gs.makeMove(move)
+
+    return {
+        "index": index,
+        "fen": fen,
+        "white": players[0]["name"],
+        "black": players[1]["name"],
+        "result": result,
+        "termination": termination,
+        "moves": sanMoves,
+        # per engine, engines[0] first
+        "seconds": seconds if index % 2 == 0 else seconds[::-1],
+        "nodes": nodes if index % 2 == 0 else nodes[::-1],
+        "moveCounts": moveCounts if index % 2 == 0 else moveCounts[::-1],
+    }
+
+
+def eloEstimate(wins, draws, losses) -> tuple:
+    """Elo difference for the score and the half width of its 95% interval.
+
+    The interval comes from the standard error of the mean game score, mapped
+    through the logistic Elo curve. A score of 0% or 100% gives infinities.
+    """
+    games = wins + draws + losses
+    score = (wins + draws / 2) / games
+
+    def elo(fraction):
+        if fraction <= 0:
+            return -math.inf
+        if fraction >= 1:
+            return math.inf
+        return -400 * math.log10(1 / fraction - 1)
+
+    variance = (
+        wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score**2
+    ) / games
+    margin = 1.96 * math.sqrt(variance / games)
+    return elo(score), (elo(score + margin) - elo(score - margin)) / 2
+
+
+def runMatch(engines, games, openings, pgnPath, processes, seed=0) -> tuple:
+    """Play the match and append its games to `pgnPath`.
+
+    Game i starts from openings[i // 2 % len(openings)], so both engines get
+    every opening once with each colour. Returns (wins, draws, losses) of
+    engines[0].
+    """
+    jobs = [
+        (index, openings[index // 2 % len(openings)], engines, seed + index)
+        for index in range(games)
+    ]
+    score = [0, 0, 0]  # wins, draws, losses of engines[0]
+    seconds, nodes, moveCounts = [0.0, 0.0], [0, 0], [0, 0]
+    date = time.strftime("%Y.%m.%d")
+    with multiprocessing.Pool(processes) as pool, open(pgnPath, "a") as out:
+        for done, game in enumerate(pool.imap_unordered(playGame, jobs), 1):
+            headers = {
+                "Event": "Castled Realms engine match",
+                "Site": "match.py",
+                "Date": date,
+                "Round": str(game["index"] + 1),
+                "White": game["white"],
+                "Black": game["black"],
+                "Termination": game["termination"],
+                "PlyCount": str(len(game["moves"])),
+            }
+            out.write(formatGame(headers, game["moves"], game["result"], game["fen"]))
+            out.flush()  # a long match can be looked at (or stopped) at any time
+
+            if game["result"] == "1/2-1/2":
+                score[1] += 1
+            elif (game["result"] == "1-0") == (game["index"] % 2 == 0):
+                score[0] += 1
+            else:
+                score[2] += 1
+            for i in range(2):
+                seconds[i] += game["seconds"][i]
+                nodes[i] += game["nodes"][i]
+                moveCounts[i] += game["moveCounts"][i]
+            print(
+                f"Game {done}/{games}: {game['white']} - {game['black']} "
+                f"{game['result']} ({game['termination']}), "
+                f"+{score[0]} ={score[1]} -{score[2]}"
+            )
+
+    wins, draws, losses = score
+    elo, margin = eloEstimate(wins, draws, losses)
+    print(
+        f"\n{engines[0]['name']} vs {engines[1]['name']}: "
+        f"{wins} wins, {draws} draws, {losses} losses, "
+        f"score {(wins + draws / 2) / games:.1%}\n"
+        f"Elo difference {elo:+.0f} +/- {margin:.0f} (95%)"
+    )
+    for i, engine in enumerate(engines):
+        perMove = seconds[i] / max(moveCounts[i], 1)
+        nodesPerMove = nodes[i] / max(moveCounts[i], 1)
+        print(
+            f"  {engine['name']}: {perMove:.3f}s/move, {nodesPerMove:.0f} nodes/move, "
+            f"{nodes[i] / max(seconds[i], 1e-9):.0f} nodes/s"
+        )
+    print(f"Games written to {pgnPath}")
+    return wins, draws, losses
+
+
+def readOpenings(path) -> list:
+    """Start positions, one FEN per line, # comments."""
+    with open(path) as source:
+        lines = [line.split("#")[0].strip() for line in source]
+    return [line for line in lines if line]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play one engine against another.")
+    parser.add_argument("first", help='engine settings, e.g. "MAX_DEPTH=3"')
+    parser.add_argument("second", help="settings of the engine it plays against")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--time", type=float, default=0.5, help="seconds per move")
+    parser.add_argument("--openings", help="file of start positions, one FEN a line")
+    parser.add_argument("--pgn", default="match.pgn", help="games are appended here")
+    parser.add_argument("--processes", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    runMatch(
+        [parseEngine(args.first, args.time), parseEngine(args.second, args.time)],
+        args.games,
+        readOpenings(args.openings) if args.openings else [START_FEN],
+        args.pgn,
+        args.processes,
+        args.seed,
+    )
@@ -0,0 +1,106 @@
+"""
+Move ordering for the search: the sooner the best move is tried, the sooner
+alpha-beta cuts off, so every node sorts its moves by how likely they are to be
+best:
+
+    1. the move the transposition table remembers for the position
+    2. captures and promotions, most valuable victim first, then least
+       valuable attacker (MVV-LVA)
+    3. the two killer moves of the ply, quiet moves that caused a cutoff in a
+       sibling position
+    4. the other quiet moves, by their history score: how often and how deep
+       that from/to square pair has caused cutoffs so far
+
+Killers and history are learned during a search. newSearch clears the killers
+and decays the history, so old knowledge fades but is not thrown away. The
+cutoff statistics show how well the ordering works: in a well ordered tree
+almost every cutoff comes from the first move tried.
+"""
+
+from array import array
+
+from config import PIECESCORE
+from engine import CAPTURE, PROMOTION
+
+MAX_PLY = 128  # deepest ply that keeps killer moves
+# sort keys, each tier above everything below it. The low 24 bits of a key hold
+# the move and its place in the input, so equal moves keep their order.
+TT_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 28
+KILLER_SCORE = 1 << 27
+HISTORY_MAX = 1 << 20  # the whole table is halved once an entry gets past this
+
+# two quiet moves per ply that caused a cutoff, most recent first
+killers = [[0, 0] for _ in range(MAX_PLY)]
+# cutoff score of every (from, to) square pair, indexed by the move's low 12 bits
+history = array("l", bytes(4096 * array("l").itemsize))
+cutoffs = 0  # beta cutoffs in the current search
+firstMoveCutoffs = 0  # ... of which the first move tried caused
+
+
+def orderMoves(gs, moves, ply=None, ttMove=0) -> list:
+    """`moves` sorted best first, `ply` (for the killers) and `ttMove` if known."""
+    board = gs.board
+    plyKillers = killers[ply] if ply is not None and ply < MAX_PLY else (0, 0)
+    keyed = []
+    for i, move in enumerate(moves):
+        if move == ttMove:
+            score = TT_MOVE_SCORE
+        elif move >> 12 & (CAPTURE | PROMOTION):
+            start, end, flags = move & 63, move >> 6 & 63, move >> 12
+            victim = board[end >> 3][end & 7]
+            if victim != ".":
+                score = CAPTURE_SCORE + PIECESCORE[victim[1]] * 32
+            elif flags & CAPTURE:
+                score = CAPTURE_SCORE + PIECESCORE["p"] * 32  # en passant
+            else:
+                score = CAPTURE_SCORE
+            score -= PIECESCORE[board[start >> 3][start & 7][1]]
+            if flags & PROMOTION:
+                score += PIECESCORE["Q"] * 32
+        elif move == plyKillers[0]:
+            score = KILLER_SCORE + 1
+        elif move == plyKillers[1]:
+            score = KILLER_SCORE
+        else:
+            score = history[move & 4095]
+        keyed.append(score << 24 | (255 - i) << 16 | move)
+    keyed.sort(reverse=True)
+    return [key & 0xFFFF for key in keyed]
+
+
+def recordCutoff(move, ply, depth, index) -> None:
+    """`move`, tried as number `index` at `ply`, failed high with `depth` to go."""
+    global cutoffs, firstMoveCutoffs
+    cutoffs += 1
+    if index == 0:
+        firstMoveCutoffs += 1
+    if move >> 12 & (CAPTURE | PROMOTION):
+        return  # captures are already ordered by MVV-LVA
+    if ply < MAX_PLY:
+        plyKillers = killers[ply]
+        if plyKillers[0] != move:
+            plyKillers[1] = plyKillers[0]
+            plyKillers[0] = move
+    fromTo = move & 4095
+    history[fromTo] += depth * depth  # deep cutoffs say more than shallow ones
+    if history[fromTo] > HISTORY_MAX:
+        for i in range(4096):
+            history[i] >>= 1
+
+
+def newSearch() -> None:
+    """Forget the killers, decay the history and reset the cutoff statistics."""
+    global cutoffs, firstMoveCutoffs
+    for plyKillers in killers:
+        plyKillers[0] = plyKillers[1] = 0
+    for i in range(4096):
+        history[i] >>= 2
+    cutoffs = firstMoveCutoffs = 0
+
+
+def cutoffStats() -> str:
+    """How often the first move tried was the one to cut off, for the search log."""
+    if not cutoffs:
+        return "no cutoffs"
+    return f"{firstMoveCutoffs / cutoffs:.0%} of {cutoffs} cutoffs on the first move"
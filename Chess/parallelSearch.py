@@ -0,0 +1,181 @@
+"""
+Lazy SMP: several processes run the normal iterative deepening search on the
+same root and share one transposition table.
+
+Nobody splits the tree up. The helpers start at staggered depths and walk the
+root moves in their own order, so they drift apart and fill the shared table
+with scores and best moves that the others then cut off on. Worker 0 searches
+exactly like the single process search does, once it is done the helpers are
+stopped and the deepest completed result wins.
+
+    python Chess/parallelSearch.py            # 2 processes vs 1, time to depth 2
+    python Chess/parallelSearch.py 4 3        # 4 processes vs 1, time to depth 3
+"""
+
+import atexit
+import multiprocessing
+import random
+import sys
+import time
+
+import smartMoveFinder
+from config import NODE_LIMIT, TIME_LIMIT, TT_SIZE_MB
+from engine import State
+from smartMoveFinder import TranspositionTable, searchRoot
+
+SPEEDUP_POSITIONS = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",
+    "r2q1rk1/4bppp/p2p4/2pP4/3pP3/3Q4/PP1B1PPP/R3R1K1 w - - 0 1",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+]
+
+# the worker pool lives as long as the game, starting processes is slow
+pool = None
+poolProcesses = 0
+sharedTable = None
+stopEvent = None
+counter = 0  # positions evaluated by all workers in the last search
+
+
+def initWorker(buffer, event):
+    """Runs once in every worker: use the main process' table and stop flag."""
+    smartMoveFinder.transposition_table = TranspositionTable(TT_SIZE_MB, buffer)
+    smartMoveFinder.stopEvent = event
+
+
+def searchWorker(index, gs, rootOrder, timeLimit, nodeLimit, maxDepth, generation):
+    """One Lazy SMP thread of search, returns (index, moveID, depth, score, nodes)."""
+    smartMoveFinder.transposition_table.generation = generation
+    position = {moveID: i for i, moveID in enumerate(rootOrder)}
+    validMoves = sorted(gs.getValidMoves(), key=position.__getitem__)
+    if index:
+        # helpers take the root moves in their own order and every other one
+        # skips depth 1, so they do not all search the same tree in lockstep
+        random.Random(index).shuffle(validMoves)
+    bestMove, depth, score, _ = searchRoot(
+        gs, validMoves, timeLimit, nodeLimit, 1 + index % 2, maxDepth
+    )
+    return index, bestMove, depth, score, smartMoveFinder.counter
+
+
+def getPool(processes):
+    """Start (or restart with a new size) the worker pool and its shared table."""
+    global pool, poolProcesses, sharedTable, stopEvent
+    if pool is None or poolProcesses != processes:
+        closePool()
+        size = TranspositionTable.tableBytes(TT_SIZE_MB)
+        buffer = multiprocessing.RawArray("B", size)
+        sharedTable = TranspositionTable(TT_SIZE_MB, buffer)
+        stopEvent = multiprocessing.Event()
+        pool = multiprocessing.Pool(processes, initWorker, (buffer, stopEvent))
+        poolProcesses = processes
+    return pool
+
+
+def closePool():
+    global pool
+    if pool is not None:
+        pool.terminate()
+        pool.join()
+        pool = None
+
+
+atexit.register(closePool)
+
+
+def findBestMoveParallel(
+    gs,
+    validMoves,
+    timeLimit=TIME_LIMIT,
+    nodeLimit=NODE_LIMIT,
+    processes=2,
+    maxDepth=None,
+    verbose=True,
+):
+    """findBestMove on `processes` processes sharing one transposition table.
+
+    The node budget is per process. Returns the move of the deepest completed
+    search, worker 0 wins ties since its iterations are not staggered.
+    """
+    global counter
+    workers = getPool(processes)
+    stopEvent.clear()
+    sharedTable.newSearch()
+    rootOrder = list(validMoves)
+    pending = [
+        workers.apply_async(
+            searchWorker,
+            (
+                index,
+                gs,
+                rootOrder,
+                timeLimit,
+                nodeLimit,
+                maxDepth,
+                sharedTable.generation,
+            ),
+        )
+        for index in range(processes)
+    ]
+    pending[0].wait()
+    stopEvent.set()  # the main line is done, call the helpers off
+    results = [result.get() for result in pending]
+    index, moveID, depth, _, _ = max(
+        results, key=lambda result: (result[2], -result[0])
+    )
+    counter = sum(result[4] for result in results)
+    if verbose:
+        print(
+            f"Evaluated {counter} positions, depth {depth} "
+            f"({processes} processes, best from worker {index})"
+        )
+    return moveID
+
+
+def measureSpeedup(processes, depth, positions=SPEEDUP_POSITIONS):
+    """Time to reach `depth` on one process and on `processes`, from an empty table.
+
+    Returns the overall speedup (single process time / parallel time).
+    """
+    getPool(processes)  # start the workers before the clock does
+    singleTotal = parallelTotal = 0.0
+    singleNodes = parallelNodes = 0
+    for fen in positions:
+        gs = State(fen)
+
+        smartMoveFinder.transposition_table.clear()
+        smartMoveFinder.transposition_table.newSearch()
+        start = time.perf_counter()
+        searchRoot(gs, gs.getValidMoves(), float("inf"), 0, maxDepth=depth)
+        single = time.perf_counter() - start
+        singleNodes += smartMoveFinder.counter
+
+        sharedTable.clear()
+        start = time.perf_counter()
+        findBestMoveParallel(gs, gs.getValidMoves(), float("inf"), 0, processes, depth)
+        parallel = time.perf_counter() - start
+        parallelNodes += counter
+
+        singleTotal += single
+        parallelTotal += parallel
+        print(
+            f"  {fen}\n    1 process {single:7.2f}s   {processes} processes "
+            f"{parallel:7.2f}s   speedup {single / parallel:.2f}x"
+        )
+    speedup = singleTotal / parallelTotal
+    print(
+        f"Depth {depth}: 1 process {singleTotal:.2f}s "
+        f"({singleNodes / singleTotal:.0f} nodes/s), {processes} processes "
+        f"{parallelTotal:.2f}s ({parallelNodes / parallelTotal:.0f} nodes/s), "
+        f"speedup {speedup:.2f}x on {multiprocessing.cpu_count()} cores"
+    )
+    return speedup
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    measureSpeedup(
+        int(args[0]) if args else 2,
+        int(args[1]) if len(args) > 1 else 2,
+    )
@@ -0,0 +1,194 @@
+"""
+Perft: count the leaf nodes of the legal move tree to a fixed depth.
+
+The counts for well known positions are published, so any mismatch points at a
+move generation bug, and the time taken is a direct measure of how fast
+getValidMoves/makeMove/undoMove are.
+
+    python Chess/perft.py                  # reference suite up to depth 3
+    python Chess/perft.py 5                # reference suite up to depth 5
+    python Chess/perft.py divide 3 [fen]   # node count below every root move
+"""
+
+import sys
+import time
+
+from engine import State, moveNotation
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# (name, fen, {depth: nodes}) - counts from the chessprogramming wiki perft results
+# and Peter Ellis Jones' list of special cases
+REFERENCE_POSITIONS = [
+    (
+        "Initial position",
+        START_FEN,
+        {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609},
+    ),
+    (
+        "Kiwipete",
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        {1: 48, 2: 2039, 3: 97862, 4: 4085603},
+    ),
+    (
+        "Position 3 (en passant, rook pins)",
+        "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+        {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624},
+    ),
+    (
+        "Position 4 (promotions, castling)",
+        "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+        {1: 6, 2: 264, 3: 9467, 4: 422333},
+    ),
+    (
+        "Position 5",
+        "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+        {1: 44, 2: 1486, 3: 62379, 4: 2103487},
+    ),
+    (
+        "Illegal en passant (pinned along the rank)",
+        "3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1",
+        {6: 1134888},
+    ),
+    (
+        "Illegal en passant (pinned along the diagonal)",
+        "8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1",
+        {6: 1015133},
+    ),
+    (
+        "En passant capture gives check",
+        "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1",
+        {6: 1440467},
+    ),
+    (
+        "Short castling gives check",
+        "5k2/8/8/8/8/8/8/4K2R w K - 0 1",
+        {6: 661072},
+    ),
+    (
+        "Long castling gives check",
+        "3k4/8/8/8/8/8/8/R3K3 w Q - 0 1",
+        {6: 803711},
+    ),
+    (
+        "Castling rights lost by rook capture",
+        "r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1",
+        {4: 1274206},
+    ),
+    (
+        "Castling prevented",
+        "r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1",
+        {4: 1720476},
+    ),
+    (
+        "Promote out of check",
+        "2K2r2/4P3/8/8/8/8/8/3k4 w - - 0 1",
+        {6: 3821001},
+    ),
+    (
+        "Discovered check",
+        "8/8/1P2K3/8/2n5/1q6/8/5k2 b - - 0 1",
+        {5: 1004658},
+    ),
+    (
+        "Promote to give check",
+        "4k3/1P6/8/8/8/8/K7/8 w - - 0 1",
+        {6: 217342},
+    ),
+    (
+        "Underpromote to check",
+        "8/P1k5/K7/8/8/8/8/8 w - - 0 1",
+        {6: 92683},
+    ),
+    (
+        "Self stalemate",
+        "K1k5/8/P7/8/8/8/8/8 w - - 0 1",
+        {6: 2217},
+    ),
+    (
+        "Stalemate and checkmate",
+        "8/k1P5/8/1K6/8/8/8/8 w - - 0 1",
+        {7: 567584},
+    ),
+    (
+        "Double check",
+        "8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1",
+        {4: 23527},
+    ),
+]
+
+
+def perft(gs, depth) -> int:
+    """Number of leaf nodes `depth` plies below the current position.
+
+    The last ply is bulk counted: the length of the move list is the number of
+    leaves, so the leaves themselves are never made.
+    """
+    if depth == 0:
+        return 1
+    moves = gs.getValidMoves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        gs.makeMove(move)
+        nodes += perft(gs, depth - 1)
+        gs.undoMove()
+    return nodes
+
+
+def divide(gs, depth) -> dict:
+    """Perft split by root move, handy for bisecting a wrong count against another engine."""
+    counts = {}
+    for move in gs.getValidMoves():
+        gs.makeMove(move)
+        counts[moveNotation(move)] = perft(gs, depth - 1)
+        gs.undoMove()
+    return counts
+
+
+def runSuite(maxDepth=3, positions=REFERENCE_POSITIONS) -> bool:
+    """Run every reference count up to `maxDepth`, print node counts and speed.
+
+    Returns True when every count matched.
+    """
+    allPassed = True
+    totalNodes = 0
+    totalTime = 0.0
+    for name, fen, expected in positions:
+        depths = [depth for depth in sorted(expected) if depth <= maxDepth]
+        if not depths:
+            continue
+        print(name)
+        gs = State(fen)
+        for depth in depths:
+            start = time.perf_counter()
+            nodes = perft(gs, depth)
+            elapsed = time.perf_counter() - start
+            totalNodes += nodes
+            totalTime += elapsed
+            ok = nodes == expected[depth]
+            allPassed = allPassed and ok
+            print(
+                f"  depth {depth}: {nodes:>9} nodes {elapsed:8.3f}s "
+                f"{nodes / max(elapsed, 1e-9):>10.0f} nodes/s  "
+                + ("ok" if ok else f"MISMATCH, expected {expected[depth]}")
+            )
+    print(
+        f"Total: {totalNodes} nodes in {totalTime:.2f}s "
+        f"({totalNodes / max(totalTime, 1e-9):.0f} nodes/s)"
+    )
+    return allPassed
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args and args[0] == "divide":
+        depth = int(args[1]) if len(args) > 1 else 1
+        gs = State(" ".join(args[2:]) if len(args) > 2 else START_FEN)
+        counts = divide(gs, depth)
+        for notation in sorted(counts):
+            print(f"{notation}: {counts[notation]}")
+        print(f"Moves: {len(counts)}  Nodes: {sum(counts.values())}")
+    else:
+        sys.exit(0 if runSuite(int(args[0]) if args else 3) else 1)
@@ -0,0 +1,267 @@
+"""
+PGN: moves in standard algebraic notation (SAN) and whole games as PGN text,
+both ways.
+
+    gs = State()
+    sanNotation(gs, move)   # "Nf3", "exd5", "O-O", "e8=Q+", "Qh4#"
+    parseSAN(gs, "Nf3")     # and back to the packed move
+    formatGame(headers, sanMoves, "1-0")
+    for headers, sanMoves, result in readGames("games.pgn"): ...
+
+readGames goes through the file a line at a time, so archives of any size can
+be read, and replayGames plays every game through makeMove:
+
+    python Chess/pgn.py games.pgn   # replay every game, report games and moves/s
+"""
+
+import re
+import sys
+import textwrap
+import time
+
+from engine import (
+    CAPTURE,
+    KING_CASTLE,
+    PROMOTION,
+    PROMOTION_CHOICES,
+    QUEEN_CASTLE,
+    Move,
+    State,
+)
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+# the Seven Tag Roster, every PGN game starts with these tags in this order
+REQUIRED_TAGS = ["Event", "Site", "Date", "Round", "White", "Black", "Result"]
+RESULTS = {"1-0", "0-1", "1/2-1/2", "*"}
+
+# piece, origin file, origin rank, capture, target square, promotion
+SAN = re.compile(
+    r"([NBRQK])?([a-h])?([1-8])?(x)?([a-h][1-8])(?:=?([NBRQ]))?[+#]?[!?]*$"
+)
+TAG = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+# in movetext: comments and variations open and close, everything else is a token
+# (move numbers like "12." or "12..." are split off the move that follows them,
+# and the "e.p." after an en passant capture is one token so it can be skipped)
+MOVETEXT = re.compile(r"[{}();]|\d+\.+|e\.p\.|[^\s{}();.]+")
+
+
+def squareName(sq) -> str:
+    return Move.colsToFiles[sq & 7] + Move.rowsToRanks[sq >> 3]
+
+
+def sanNotation(gs, move, validMoves=None) -> str:
+    """SAN of the packed `move`, which has to be legal in `gs`.
+
+    `validMoves` are the legal moves of the position when the caller already
+    has them, they are needed to tell apart two pieces that can reach the same
+    square. The move is made and taken back to see whether it checks or mates.
+    """
+    start, end, flags = move & 63, move >> 6 & 63, move >> 12
+    if flags == KING_CASTLE:
+        san = "O-O"
+    elif flags == QUEEN_CASTLE:
+        san = "O-O-O"
+    else:
+        board = gs.board
+        piece = board[start >> 3][start & 7]
+        capture = "x" if flags & CAPTURE else ""
+        if piece[1] == "p":
+            san = (squareName(start)[0] if capture else "") + capture
+            san += squareName(end)
+            if flags & PROMOTION:
+                san += "=" + PROMOTION_CHOICES[flags & 3]
+        else:
+            if validMoves is None:
+                validMoves = gs.getValidMoves()
+            # other pieces of the same kind that could go to the same square
+            rivals = [
+                other & 63
+                for other in validMoves
+                if other >> 6 & 63 == end
+                and other & 63 != start
+                and board[(other & 63) >> 3][other & 7] == piece
+            ]
+            origin = ""
+            if rivals:
+                if all(rival & 7 != start & 7 for rival in rivals):
+                    origin = squareName(start)[0]  # the file is enough
+                elif all(rival >> 3 != start >> 3 for rival in rivals):
+                    origin = squareName(start)[1]  # the rank is enough
+                else:
+                    origin = squareName(start)
+            san = piece[1] + origin + capture + squareName(end)
+
+    gs.makeMove(move)
+    if gs.inCheck():
+        san += "+" if gs.getValidMoves() else "#"
+    gs.undoMove()
+    return san
+
+
+def formatGame(headers, sanMoves, result, fen=None) -> str:
+    """One game as PGN text: the tag pairs, then the numbered moves and result.
+
+    `headers` maps tag names to values, the Seven Tag Roster comes first and is
+    filled with "?" where missing. A game that does not start from the initial
+    position gets SetUp and FEN tags and numbers its moves from the FEN.
+    """
+    tags = {tag: "?" for tag in REQUIRED_TAGS}
+    tags.update(headers)
+    tags["Result"] = result
+    number, blackToMove = 1, False
+    if fen is not None and fen.split()[:4] != START_FEN.split()[:4]:
+        tags["SetUp"] = "1"
+        tags["FEN"] = fen
+        fields = fen.split()
+        blackToMove = fields[1] == "b"
+        number = int(fields[5]) if len(fields) > 5 else 1
+    lines = [f'[{tag} "{value}"]' for tag, value in tags.items()]
+
+    tokens = []
+    for san in sanMoves:
+        if not blackToMove:
+            tokens.append(f"{number}.")
+        elif not tokens:
+            tokens.append(f"{number}...")  # the game starts with black's move
+        tokens.append(san)
+        if blackToMove:
+            number += 1
+        blackToMove = not blackToMove
+    tokens.append(result)
+    movetext = textwrap.fill(
+        " ".join(tokens), width=79, break_long_words=False, break_on_hyphens=False
+    )
+    return "\n".join(lines) + "\n\n" + movetext + "\n\n"
+
+
+def parseSAN(gs, san, validMoves=None) -> int:
+    """The packed move that `san` stands for in `gs`.
+
+    Raises ValueError when no legal move fits, or more than one does. Castling
+    may be written with zeros and "=" before a promotion piece may be left out.
+    """
+    if validMoves is None:
+        validMoves = gs.getValidMoves()
+    castle = san.rstrip("+#!?").replace("0", "O")
+    if castle in ("O-O", "O-O-O"):
+        flag = KING_CASTLE if castle == "O-O" else QUEEN_CASTLE
+        for move in validMoves:
+            if move >> 12 == flag:
+                return move
+        raise ValueError(f"{san} is not a legal move here")
+
+    found = SAN.match(san)
+    if found is None:
+        raise ValueError(f"{san} is not a move in SAN")
+    piece, file, rank, _, target, promotion = found.groups()
+    piece = piece or "p"
+    end = Move.ranksToRows[target[1]] * 8 + Move.filesToCols[target[0]]
+    col = Move.filesToCols[file] if file else -1
+    row = Move.ranksToRows[rank] if rank else -1
+    board = gs.board
+    matches = []
+    for move in validMoves:
+        if move >> 6 & 63 != end:
+            continue
+        start, flags = move & 63, move >> 12
+        if (
+            board[start >> 3][start & 7][1] != piece
+            or (col >= 0 and start & 7 != col)
+            or (row >= 0 and start >> 3 != row)
+        ):
+            continue
+        if flags & PROMOTION:
+            if PROMOTION_CHOICES[flags & 3] != promotion:
+                continue
+        elif promotion:
+            continue
+        matches.append(move)
+    if len(matches) != 1:
+        problem = "ambiguous" if matches else "not a legal move here"
+        raise ValueError(f"{san} is {problem}")
+    return matches[0]
+
+
+def readGames(path):
+    """Yield (headers, SAN moves, result) for every game in the PGN file at `path`.
+
+    Comments, variations, NAGs and move numbers are skipped. A game ends with
+    its result, or with the tags of the next game when the result is missing.
+    """
+    headers, moves, result = {}, [], "*"
+    comment = False  # inside {...}, which may run over several lines
+    variation = 0  # depth of (...) nesting
+    with open(path, encoding="utf-8", errors="replace") as source:
+        for line in source:
+            if not comment and not variation and line.startswith("["):
+                if moves:  # the last game had no result
+                    yield headers, moves, result
+                    headers, moves, result = {}, [], "*"
+                tag = TAG.match(line)
+                if tag:
+                    headers[tag[1]] = tag[2].replace('\\"', '"')
+                continue
+            if line.startswith("%"):
+                continue  # escaped line
+            for token in MOVETEXT.findall(line):
+                if comment:
+                    comment = token != "}"
+                elif token == "{":
+                    comment = True
+                elif token == ";":
+                    break  # the rest of the line is a comment
+                elif token == "(":
+                    variation += 1
+                elif token == ")":
+                    variation -= 1
+                elif variation or token[0] == "$" or token[-1] == ".":
+                    continue  # inside a variation, a NAG, a move number or "e.p."
+                elif token in RESULTS:
+                    yield headers, moves, token
+                    headers, moves, result = {}, [], "*"
+                else:
+                    moves.append(token)
+    if moves or headers:
+        yield headers, moves, result
+
+
+def replayGame(headers, sanMoves) -> State:
+    """Play `sanMoves` from the game's start position, returns the final State."""
+    gs = State(headers["FEN"] if headers.get("SetUp") == "1" else None)
+    for san in sanMoves:
+        gs.makeMove(parseSAN(gs, san))
+    return gs
+
+
+def replayGames(path) -> tuple:
+    """Replay every game of the file at `path` and print how fast that went.
+
+    A game with a move that cannot be played is reported and skipped. Returns
+    (games replayed, moves played, games that failed).
+    """
+    games = moves = failed = 0
+    start = time.perf_counter()
+    for number, (headers, sanMoves, _) in enumerate(readGames(path), 1):
+        try:
+            replayGame(headers, sanMoves)
+        except (ValueError, KeyError, IndexError) as error:
+            failed += 1
+            print(
+                f"Game {number} ({headers.get('White', '?')} - "
+                f"{headers.get('Black', '?')}): {error}"
+            )
+            continue
+        games += 1
+        moves += len(sanMoves)
+    elapsed = time.perf_counter() - start
+    print(
+        f"Replayed {games} games, {moves} moves in {elapsed:.2f}s "
+        f"({games / max(elapsed, 1e-9):.0f} games/s, "
+        f"{moves / max(elapsed, 1e-9):.0f} moves/s), {failed} failed"
+    )
+    return games, moves, failed
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        replayGames(path)
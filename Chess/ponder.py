@@ -0,0 +1,94 @@
+"""
+Pondering: think on the human's time.
+
+After the AI moves, the reply it expects (the best move stored for the new
+position in the transposition table) is played on a copy of the game and that
+position is searched in a background thread while the human thinks.
+
+- Ponder hit, the human played the expected move: the running search is put on
+  the normal clock as if it had started when pondering did, so after a long
+  think the answer comes straight away and it is deeper than usual.
+- Ponder miss: the search is stopped, and the normal search that follows starts
+  with a transposition table full of positions from the pondered line.
+"""
+
+import copy
+import threading
+
+import smartMoveFinder
+from config import TIME_LIMIT
+from smartMoveFinder import searchRoot
+
+
+class Ponderer:
+    def __init__(self):
+        self.thread = None
+        self.stop = threading.Event()
+        self.position = None
+        self.key = None
+        self.result = None
+
+    def predictReply(self, gs):
+        """The move the last search expects to be played here, or None."""
+        entry = smartMoveFinder.transposition_table.get(gs.zobristKey)
+        if entry is None or not entry[3]:
+            return None
+        return entry[3] if entry[3] in gs.getValidMoves() else None
+
+    def start(self, gs):
+        """Search the position after the predicted reply, False if there is none."""
+        self.cancel()
+        predicted = self.predictReply(gs)
+        if predicted is None:
+            return False
+        self.position = copy.deepcopy(gs)
+        self.position.makeMove(predicted)
+        self.key = self.position.zobristKey  # the search keeps changing position
+        self.result = None
+        self.stop.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return True
+
+    def run(self):
+        smartMoveFinder.stopEvent = self.stop
+        try:
+            moves = self.position.getValidMoves()
+            if moves:
+                smartMoveFinder.transposition_table.newSearch()
+                # no budget, it runs until the human moves
+                self.result = searchRoot(self.position, moves, float("inf"), 0)
+        finally:
+            smartMoveFinder.stopEvent = None
+
+    def cancel(self):
+        """Stop pondering and wait for the thread to finish."""
+        if self.thread is not None:
+            self.stop.set()
+            self.thread.join()
+            self.thread = None
+
+    def finish(self, gs, validMoves, timeLimit=TIME_LIMIT):
+        """The human has moved. Returns the AI move on a ponder hit, None on a miss.
+
+        On a miss the search is just stopped, its transposition table entries
+        stay and make the normal search that follows cheaper.
+        """
+        if self.thread is None:
+            return None
+        if gs.zobristKey != self.key:
+            self.cancel()
+            return None
+        # ponder hit: the search gets the time it would have had if it started
+        # when pondering did, pondering for longer than that stops it right now.
+        # Set again while waiting in case the thread was only just starting
+        # searchRoot, which would put back the unlimited budget.
+        while self.thread.is_alive():
+            smartMoveFinder.timeBudget = timeLimit
+            smartMoveFinder.deadline = smartMoveFinder.searchStart + timeLimit
+            self.thread.join(0.05)
+        self.thread = None
+        if self.result is None or not self.result[1]:
+            return None  # not even depth 1 finished, let the normal search do it
+        print(f"Ponder hit, depth {self.result[1]}")
+        return self.result[0] if self.result[0] in validMoves else None
@@ -1,24 +1,138 @@
 import random
-
-from config import CHECKMATE, DEPTH, PIECE_SQUARE_TABLES, PIECESCORE, STALEMATE
+import time
+from array import array
+
+import moveOrdering
+import numpy as np
+import tablebase
+from book import bookMove
+from config import (
+    ASPIRATION_WINDOW,
+    BATCH_LEAF_EVAL,
+    CHECKMATE,
+    DOUBLED_PAWN_PENALTY,
+    KING_SAFETY_PENALTY,
+    LATE_MOVE_REDUCTIONS,
+    LMR_FULL_DEPTH_MOVES,
+    MAX_DEPTH,
+    NODE_LIMIT,
+    NULL_MOVE_PRUNING,
+    NULL_MOVE_REDUCTION,
+    OPENING_BOOK,
+    QUIESCENCE,
+    SEARCH_PROCESSES,
+    STALEMATE,
+    TABLEBASES,
+    TIME_LIMIT,
+    TT_SIZE_MB,
+)
+from engine import (
+    BLACK,
+    CAPTURE,
+    EN_PASSANT,
+    FILE_A,
+    KING,
+    KING_CASTLE,
+    NULL_MOVE,
+    PAWN,
+    PIECE_INDEX,
+    PIECE_SQUARE_VALUES,
+    PROMOTION,
+    PROMOTION_CHOICES,
+    QUEEN_CASTLE,
+    WHITE,
+    moveNotation,
+)
+from moveOrdering import orderMoves, recordCutoff
+
+# bound types stored with every transposition table score
+EXACT, LOWER_BOUND, UPPER_BOUND = 1, 2, 3
+MATE_THRESHOLD = CHECKMATE - 1000  # scores beyond this are "mate in n plies"
 
 
 class TranspositionTable:
-    """Simple transposition table for memoization"""
-
-    def __init__(self):
-        self.table = {}
-
-    def get(self, board_hash, depth):
-        key = (board_hash, depth)
-        return self.table.get(key)
-
-    def store(self, board_hash, depth, score, move):
-        key = (board_hash, depth)
-        self.table[key] = (score, move)
+    """Fixed-size transposition table backed by one preallocated array.
+
+    Every bucket holds two entries of two 64-bit words each (key ^ data, packed
+    data). Storing the key xor'ed with the data means an entry torn by two
+    processes writing it at once no longer matches its key, so a shared table
+    needs no locks.
+    The first entry is depth-preferred and only gives way to deeper searches or
+    entries left over from an older search, the second one is always replaced.
+    Packed data layout, low bits first:
+        score + 2**31 : 32 bits
+        move id       : 16 bits
+        depth         : 8 bits
+        bound type    : 2 bits
+        generation    : 6 bits
+    """
+
+    ENTRY_BYTES = 16
+
+    def __init__(self, size_mb=TT_SIZE_MB, buffer=None):
+        words = self.tableBytes(size_mb) // 8
+        self.mask = (words >> 2) - 1
+        if buffer is None:
+            self.table = array("Q", bytes(words * 8))
+        else:
+            # somebody else's memory, e.g. a table shared between search processes
+            self.table = memoryview(buffer).cast("B").cast("Q")[:words]
+        self.generation = 0
+
+    @classmethod
+    def tableBytes(cls, size_mb):
+        """Size of the table for `size_mb`, rounded down to a power of two buckets."""
+        entries = max(2, size_mb * 1024 * 1024 // cls.ENTRY_BYTES)
+        buckets = 1 << ((entries // 2).bit_length() - 1)  # power of two for masking
+        return buckets * 2 * cls.ENTRY_BYTES
+
+    def newSearch(self):
+        """Age the table: entries from earlier searches become cheap to replace."""
+        self.generation = (self.generation + 1) & 63
+
+    def get(self, board_hash):
+        """Return (depth, bound, score, moveID) stored for the position, or None."""
+        table = self.table
+        index = (board_hash & self.mask) << 2
+        for slot in (index, index + 2):
+            data = table[slot + 1]
+            if data and table[slot] ^ data == board_hash:
+                return (
+                    (data >> 48) & 0xFF,
+                    (data >> 56) & 3,
+                    (data & 0xFFFFFFFF) - 0x80000000,
+                    (data >> 32) & 0xFFFF,
+                )
+        return None
+
+    def store(self, board_hash, depth, bound, score, moveID):
+        table = self.table
+        index = (board_hash & self.mask) << 2
+        data = table[index + 1]
+        if (
+            table[index] ^ data == board_hash
+            or not data
+            or depth >= (data >> 48) & 0xFF
+            or (data >> 58) != self.generation
+        ):
+            slot = index  # depth-preferred entry
+        else:
+            slot = index + 2  # always-replace entry
+        if not moveID and table[slot] ^ table[slot + 1] == board_hash:
+            moveID = (table[slot + 1] >> 32) & 0xFFFF  # keep the old best move
+        data = (
+            (int(score) + 0x80000000)
+            | moveID << 32
+            | min(depth, 255) << 48
+            | bound << 56
+            | self.generation << 58
+        )
+        table[slot] = board_hash ^ data
+        table[slot + 1] = data
 
     def clear(self):
-        self.table.clear()
+        # in place, the memory may be shared with other processes
+        memoryview(self.table).cast("B")[:] = bytes(len(self.table) * 8)
 
 
 transposition_table = TranspositionTable()
@@ -29,118 +143,449 @@ def findRandomMove(validMoves):
     return validMoves[random.randint(0, len(validMoves) - 1)]
 
 
-def findBestMove(gs, validMoves):
-    global nextMove, counter
-    nextMove = None
-    random.shuffle(validMoves)  # Shuffle to add randomness in AI's choice
-    counter = 0  # Reset the counter for move evaluations
-    findNegaMaxMoveWithAlphaBeta(
-        gs,
-        validMoves,
-        DEPTH,
-        1 if gs.white_to_move else -1,
-        -float("inf"),
-        float("inf"),
-    )
-    print(f"Evaluated {counter} positions")
-    return nextMove
-
+class SearchTimeout(Exception):
+    """Raised inside the search when the time or node budget is used up."""
+
+
+# set by whoever runs the search in the background (a threading or
+# multiprocessing Event), the search gives up as soon as it is set
+stopEvent = None
+# called as iterationHook(depth, bestMove, score) after every completed iteration,
+# e.g. by the EPD runner to see when the search first found the right move
+iterationHook = None
+searchStart = 0.0
+timeBudget = TIME_LIMIT
+
+
+def findBestMove(
+    gs,
+    validMoves,
+    timeLimit=TIME_LIMIT,
+    nodeLimit=NODE_LIMIT,
+    processes=SEARCH_PROCESSES,
+    verbose=True,
+):
+    """Pick the AI's move within the time/node budget.
+
+    Opening positions are answered from the book and endings with few pieces
+    from the tablebases, both without a search. With more
+    than one process the search is handed to parallelSearch, which runs
+    several copies of it sharing one transposition table. `counter` holds the
+    positions evaluated afterwards, 0 for a move found without a search, and
+    `verbose` prints how the move was found.
+    """
+    global counter
+    counter = 0
+    if len(validMoves) <= 1:
+        return validMoves[0] if validMoves else None
+    if OPENING_BOOK:
+        move = bookMove(gs, validMoves)
+        if move is not None:
+            if verbose:
+                print(f"Book move {moveNotation(move)}")
+            return move
+    if TABLEBASES and gs.occupied.bit_count() <= tablebase.MAX_PIECES:
+        move = tablebase.bestMove(gs, validMoves)
+        if move is not None:
+            if verbose:
+                print(f"Tablebase move {moveNotation(move)}")
+            return move
+    if processes > 1:
+        # imported here, the browser build has no multiprocessing
+        from parallelSearch import findBestMoveParallel
+
+        return findBestMoveParallel(
+            gs, validMoves, timeLimit, nodeLimit, processes, verbose=verbose
+        )
 
-def orderMoves(gs, moves):
-    """Order moves for better alpha-beta pruning"""
+    transposition_table.newSearch()
+    bestMove, completedDepth, _, line = searchRoot(gs, validMoves, timeLimit, nodeLimit)
+    if verbose:
+        print(
+            f"Evaluated {counter} positions, depth {completedDepth}, "
+            + moveOrdering.cutoffStats()
+        )
+        print("Principal variation: " + " ".join(moveNotation(m) for m in line))
+    return bestMove
+
+
+def searchRoot(
+    gs,
+    validMoves,
+    timeLimit=TIME_LIMIT,
+    nodeLimit=NODE_LIMIT,
+    startDepth=1,
+    maxDepth=None,
+):
+    """Iterative deepening: search depth 1, 2, 3, ... until the budget runs out.
+
+    Only a completed iteration is trusted, so the move returned is the best move
+    of the deepest search that finished. The node budget only applies once the
+    first iteration is done, and should the clock stop that one, the best root
+    move it has searched is played rather than one it never looked at. Each
+    iteration starts with the previous best move, which makes the next iteration
+    cut off much earlier, and with an aspiration window around the previous
+    score, which is widened and searched again when the score falls outside it.
+    Returns (best move, depth completed, score for the side to move, principal
+    variation).
+    """
+    global nextMove, counter, rootDepth, deadline, maxNodes, searchStart, timeBudget
+    counter = 0  # Reset the counter for move evaluations
+    # globals so a ponder hit can put a running search on the clock
+    searchStart = time.perf_counter()
+    timeBudget = timeLimit
+    deadline = searchStart + timeLimit
+    maxNodes = 0  # the first iteration always finishes, nodeLimit applies after
+    rootPly = len(gs.move_log)
+    moveOrdering.newSearch()
+    ttEntry = transposition_table.get(gs.zobristKey)
+    validMoves = orderMoves(gs, validMoves, 0, ttEntry[3] if ttEntry else 0)
+    bestMove = validMoves[0]
+    completedDepth = 0
+    bestScore = 0
+    for rootDepth in range(startDepth, (maxDepth or MAX_DEPTH) + 1):
+        delta = ASPIRATION_WINDOW
+        alpha, beta = -float("inf"), float("inf")
+        if completedDepth and abs(bestScore) < MATE_THRESHOLD:
+            alpha, beta = bestScore - delta, bestScore + delta
+        try:
+            while True:
+                nextMove = None
+                score = findNegaMaxMoveWithAlphaBeta(
+                    gs,
+                    validMoves,
+                    rootDepth,
+                    1 if gs.white_to_move else -1,
+                    alpha,
+                    beta,
+                )
+                # outside the window the score is only a bound, widen that side
+                # (after a few tries all the way) and search again
+                wide = delta >= 16 * ASPIRATION_WINDOW
+                delta *= 4
+                if score <= alpha:
+                    alpha = -float("inf") if wide else score - delta
+                elif score >= beta:
+                    beta = float("inf") if wide else score + delta
+                else:
+                    break
+        except SearchTimeout:
+            # the search was thrown out mid-line, take back the moves it left on the board
+            while len(gs.move_log) > rootPly:
+                if gs.move_log[-1] == NULL_MOVE:
+                    gs.undoNullMove()
+                else:
+                    gs.undoMove()
+            if not completedDepth and nextMove is not None:
+                bestMove = nextMove  # better than a move that was never searched
+            break
+        bestMove = nextMove
+        completedDepth = rootDepth
+        bestScore = score
+        # best move first, the next iteration then gets its cutoffs much sooner
+        validMoves.remove(bestMove)
+        validMoves.insert(0, bestMove)
+        if iterationHook is not None:
+            iterationHook(rootDepth, bestMove, score)
+        if abs(score) > MATE_THRESHOLD:
+            break  # a forced mate was found, searching deeper will not change it
+        if time.perf_counter() - searchStart > timeBudget / 2 or (
+            nodeLimit and counter > nodeLimit / 2
+        ):
+            break  # the next iteration would not finish in the budget left
+        maxNodes = nodeLimit
+    return bestMove, completedDepth, bestScore, principalVariation(gs, bestMove)
+
+
+def principalVariation(gs, bestMove, maxLength=MAX_DEPTH):
+    """The line the search expects after `bestMove`, read from the table.
+
+    Every position on the line has its best move stored in the transposition
+    table, the line ends where an entry is missing, its move is not legal (a
+    key collision) or a position repeats.
+    """
+    line = [bestMove]
+    seen = {gs.zobristKey}
+    gs.makeMove(bestMove)
+    while len(line) < maxLength and gs.zobristKey not in seen:
+        seen.add(gs.zobristKey)
+        entry = transposition_table.get(gs.zobristKey)
+        if not entry or entry[3] not in gs.getValidMoves():
+            break
+        line.append(entry[3])
+        gs.makeMove(entry[3])
+    for _ in line:
+        gs.undoMove()
+    return line
 
-    def moveValue(move):
-        # Prioritize captures
-        if gs.board[move.endRow][move.endCol] != ".":
-            captured_piece = gs.board[move.endRow][move.endCol][1]
-            moving_piece = move.pieceMoved[1]
-            # MVV-LVA (Most Valuable Victim - Least Valuable Attacker)
-            return PIECESCORE[captured_piece] - PIECESCORE[moving_piece]
 
-        # Prioritize center control
-        center_bonus = 0
-        if move.endRow in [3, 4] and move.endCol in [3, 4]:
-            center_bonus = 10
+def findNegaMaxMoveWithAlphaBeta(
+    gs, validMoves, depth, turnMultiplier, alpha, beta, staticScore=None, ply=0
+):
+    """Enhanced NegaMax with alpha-beta pruning and optimizations
 
-        return center_bonus
+    `staticScore` is this position's scoreBoard (from the side to move's view)
+    when the parent already worked it out in a batch. `ply` is the distance
+    from the root, which reductions keep from being rootDepth - depth.
+    """
+    global nextMove
+    countNode()
 
-    return sorted(moves, key=moveValue, reverse=True)
+    # a position that already happened in the game or the search line is a draw
+    if ply and gs.isRepetition():
+        return STALEMATE
 
+    # no moves left: checkmate (sooner is worse) or stalemate
+    if not validMoves:
+        return -CHECKMATE + ply if gs.inCheck() else STALEMATE
+
+    # few pieces left: the tablebases know the exact result
+    if TABLEBASES and ply and gs.occupied.bit_count() <= tablebase.MAX_PIECES:
+        score = tablebase.probeScore(gs)
+        if score is not None:
+            return scoreFromTable(score, ply)
+
+    # Check transposition table, a score only counts if its bound proves it here
+    board_hash = gs.zobristKey
+    tt_entry = transposition_table.get(board_hash)
+    if tt_entry and tt_entry[0] >= depth and ply:  # Don't use TT for root
+        tt_bound, tt_score = tt_entry[1], scoreFromTable(tt_entry[2], ply)
+        if (
+            tt_bound == EXACT
+            or (tt_bound == LOWER_BOUND and tt_score >= beta)
+            or (tt_bound == UPPER_BOUND and tt_score <= alpha)
+        ):
+            return tt_score
 
-def findNegaMaxMoveWithAlphaBeta(gs, validMoves, depth, turnMultiplier, alpha, beta):
-    """Enhanced NegaMax with alpha-beta pruning and optimizations"""
-    global nextMove, counter
-    counter += 1
+    if depth == 0:
+        if staticScore is None:
+            staticScore = turnMultiplier * scoreBoard(gs)
+        if not QUIESCENCE:
+            return staticScore
+        return quiescenceSearch(
+            gs, turnMultiplier, alpha, beta, ply, validMoves, staticScore
+        )
 
-    # Check transposition table
-    board_hash = hash(str(gs.board))
-    tt_entry = transposition_table.get(board_hash, depth)
-    if tt_entry and depth < DEPTH:  # Don't use TT for root
-        return tt_entry[0]
+    inCheck = gs.inCheck()
+
+    # Null move pruning: let the opponent move twice in a row. If a shallower
+    # search still fails high, a real move would too, so cut off right away.
+    # Not in check (passing would be illegal), not twice in a row, and not with
+    # only pawns left, where having to move can be the one thing that loses.
+    us = WHITE if gs.white_to_move else BLACK
+    if (
+        NULL_MOVE_PRUNING
+        and ply
+        and depth > NULL_MOVE_REDUCTION
+        and not inCheck
+        and beta < MATE_THRESHOLD
+        and gs.move_log[-1] != NULL_MOVE
+        and gs.colorBB[us] != gs.pieceBB[us * 6 + PAWN] | gs.pieceBB[us * 6 + KING]
+        and turnMultiplier * scoreBoard(gs) >= beta
+    ):
+        gs.makeNullMove()
+        score = -findNegaMaxMoveWithAlphaBeta(
+            gs,
+            gs.getValidMoves(),
+            depth - 1 - NULL_MOVE_REDUCTION,
+            -turnMultiplier,
+            -beta,
+            -beta + 1,
+            ply=ply + 1,
+        )
+        gs.undoNullMove()
+        if score >= beta:
+            return beta  # a mate found after passing proves nothing
 
-    if depth == 0:
-        return turnMultiplier * scoreBoard(gs)
+    # Order moves for better pruning, the root moves come ordered by searchRoot
+    if ply:
+        validMoves = orderMoves(gs, validMoves, ply, tt_entry[3] if tt_entry else 0)
 
-    # Order moves for better pruning
-    validMoves = orderMoves(gs, validMoves)
+    # frontier node: every child is a leaf, score them all in one numpy pass
+    childScores = None
+    if depth == 1 and BATCH_LEAF_EVAL:
+        childScores = [-turnMultiplier * score for score in scoreBoards(gs, validMoves)]
 
+    originalAlpha = alpha
     maxScore = -float("inf")
     bestMove = None
 
-    for move in validMoves:
+    # late move reductions: quiet moves this far down the ordering rarely turn
+    # out best, so they are searched one ply shallower first
+    reduce = LATE_MOVE_REDUCTIONS and depth >= 3 and not inCheck
+
+    for i, move in enumerate(validMoves):
         gs.makeMove(move)
-        score = -findNegaMaxMoveWithAlphaBeta(
-            gs, gs.getValidMoves(), depth - 1, -turnMultiplier, -beta, -alpha
-        )
+        childMoves = gs.getValidMoves()
+        childScore = None if childScores is None else childScores[i]
+        if i == 0:
+            # principal variation search: the first move is expected to be the
+            # best, it is the only one searched with the full window
+            score = -findNegaMaxMoveWithAlphaBeta(
+                gs,
+                childMoves,
+                depth - 1,
+                -turnMultiplier,
+                -beta,
+                -alpha,
+                childScore,
+                ply + 1,
+            )
+        else:
+            # the others only have to prove they are no better than alpha, which
+            # a null window search does much more cheaply
+            newDepth = depth - 1
+            if (
+                reduce
+                and i >= LMR_FULL_DEPTH_MOVES
+                and not move >> 12 & (CAPTURE | PROMOTION)
+                and not gs.inCheck()
+            ):
+                newDepth -= 1
+            score = -findNegaMaxMoveWithAlphaBeta(
+                gs,
+                childMoves,
+                newDepth,
+                -turnMultiplier,
+                -alpha - 1,
+                -alpha,
+                childScore,
+                ply + 1,
+            )
+            if score > alpha and newDepth < depth - 1:
+                # a reduced move that may be good after all, try it at full depth
+                score = -findNegaMaxMoveWithAlphaBeta(
+                    gs,
+                    childMoves,
+                    depth - 1,
+                    -turnMultiplier,
+                    -alpha - 1,
+                    -alpha,
+                    childScore,
+                    ply + 1,
+                )
+            if alpha < score < beta:
+                # better than the first move: search it again for its exact score
+                score = -findNegaMaxMoveWithAlphaBeta(
+                    gs,
+                    childMoves,
+                    depth - 1,
+                    -turnMultiplier,
+                    -beta,
+                    -alpha,
+                    childScore,
+                    ply + 1,
+                )
         gs.undoMove()
 
         if score > maxScore:
             maxScore = score
             bestMove = move
-            if depth == DEPTH:
+            if not ply:
                 nextMove = move
 
         # Alpha-beta pruning
         alpha = max(alpha, maxScore)
         if alpha >= beta:
+            recordCutoff(move, ply, depth, i)  # teach the ordering this move
             break  # Beta cutoff
 
-    # Store in transposition table
-    if bestMove:
-        transposition_table.store(board_hash, depth, maxScore, bestMove)
+    # Store in transposition table along with what kind of bound the score is
+    if maxScore <= originalAlpha:
+        bound = UPPER_BOUND  # nothing beat alpha, the real score is at most this
+    elif maxScore >= beta:
+        bound = LOWER_BOUND  # cut off, the real score is at least this
+    else:
+        bound = EXACT
+    transposition_table.store(
+        board_hash, depth, bound, scoreToTable(maxScore, ply), bestMove
+    )
 
     return maxScore
 
 
-def scoreBoard(gs):
-    """Enhanced board evaluation with positional factors"""
-    if gs.checkMate == "checkmate":
-        return -CHECKMATE if gs.white_to_move else CHECKMATE
-    elif gs.checkMate == "stalemate":
-        return STALEMATE
+def quiescenceSearch(
+    gs, turnMultiplier, alpha, beta, ply, validMoves=None, staticScore=None
+):
+    """Play out captures until the position is quiet before trusting scoreBoard.
+
+    The side to move may "stand pat" on the static score instead of capturing,
+    so that score is a lower bound and can cut off straight away. In check there
+    is no standing pat and every evasion is searched. `validMoves` is passed in
+    from a leaf of the main search, which has already counted the node and
+    generated its moves, and possibly its `staticScore` as well.
+    """
+    if validMoves is None:
+        countNode()
+    inCheck = gs.inCheck()
+    if inCheck:
+        moves = gs.getValidMoves() if validMoves is None else validMoves
+        if not moves:
+            return -CHECKMATE + ply
+        bestScore = -CHECKMATE + ply
+    else:
+        bestScore = staticScore  # stand pat
+        if bestScore is None:
+            bestScore = turnMultiplier * scoreBoard(gs)
+        if bestScore >= beta:
+            return bestScore
+        alpha = max(alpha, bestScore)
+        if validMoves is None:
+            moves = gs.getValidMoves(capturesOnly=True)
+        else:
+            moves = [move for move in validMoves if move >> 12 & CAPTURE]
+
+    for move in orderMoves(gs, moves):
+        gs.makeMove(move)
+        score = -quiescenceSearch(gs, -turnMultiplier, -beta, -alpha, ply + 1)
+        gs.undoMove()
+        if score > bestScore:
+            bestScore = score
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+    return bestScore
+
+
+def countNode():
+    """Count a visited position and stop the search once the budget is used up."""
+    global counter
+    counter += 1
+    if (maxNodes and counter >= maxNodes) or (
+        counter & 255 == 0
+        and (
+            time.perf_counter() >= deadline
+            or (stopEvent is not None and stopEvent.is_set())
+        )
+    ):
+        raise SearchTimeout()
+
 
-    score = 0
+def scoreToTable(score, ply):
+    """Mate scores are stored relative to this node, not to the root."""
+    if score > MATE_THRESHOLD:
+        return score + ply
+    if score < -MATE_THRESHOLD:
+        return score - ply
+    return score
 
-    for row in range(8):
-        for col in range(8):
-            piece = gs.board[row][col]
-            if piece == ".":
-                continue
 
-            color = piece[0]
-            piece_type = piece[1]
+def scoreFromTable(score, ply):
+    if score > MATE_THRESHOLD:
+        return score - ply
+    if score < -MATE_THRESHOLD:
+        return score + ply
+    return score
 
-            # Material value
-            piece_value = PIECESCORE[piece_type]
 
-            # Positional value from piece-square tables
-            if color == "w":
-                positional_value = PIECE_SQUARE_TABLES[piece_type][row][col]
-                score += piece_value + positional_value
-            else:
-                # Flip the table for black pieces
-                positional_value = PIECE_SQUARE_TABLES[piece_type][7 - row][col]
-                score -= piece_value + positional_value
+def scoreBoard(gs):
+    """Enhanced board evaluation with positional factors
+
+    Material and piece-square values are kept up to date by the State on every
+    move, so they cost nothing here. Checkmate and stalemate are found by the
+    search, which knows whether any moves are left.
+    """
+    score = gs.materialScore[WHITE] - gs.materialScore[BLACK]
 
     # Additional positional factors
     score += evaluateKingSafety(gs)
@@ -156,28 +601,12 @@ def evaluateKingSafety(gs):
     # will imprpove it a bit later.
     safety_score = 0
 
-    # Find kings
-    white_king_pos = None   
-    black_king_pos = None
-
-    for row in range(8):
-        for col in range(8):
-            piece = gs.board[row][col]
-            if piece == "wK":
-                white_king_pos = (row, col)
-            elif piece == "bK":
-                black_king_pos = (row, col)
-
     # Penalize exposed kings (simplified)
-    if white_king_pos:
-        row, col = white_king_pos
-        if row > 1:  # King moved from back rank
-            safety_score -= 30
+    if gs.whiteKingLoc[0] > 1:  # King moved from back rank
+        safety_score -= KING_SAFETY_PENALTY
 
-    if black_king_pos:
-        row, col = black_king_pos
-        if row < 6:  # King moved from back rank
-            safety_score += 30
+    if gs.blackKingLoc[0] < 6:  # King moved from back rank
+        safety_score += KING_SAFETY_PENALTY
 
     return safety_score
 
@@ -185,61 +614,131 @@ def evaluateKingSafety(gs):
 def evaluatePawnStructure(gs):
     """Evaluate pawn structure"""
     pawn_score = 0
-    white_pawns = []
-    black_pawns = []
-
-    # Collect pawn positions
-    for row in range(8):
-        for col in range(8):
-            piece = gs.board[row][col]
-            if piece == "wp":
-                white_pawns.append((row, col))
-            elif piece == "bp":
-                black_pawns.append((row, col))
-
-    # Check for doubled pawns
-    white_files = [col for row, col in white_pawns]
-    black_files = [col for row, col in black_pawns]
+    white_pawns = gs.pieceBB[PIECE_INDEX["wp"]]
+    black_pawns = gs.pieceBB[PIECE_INDEX["bp"]]
 
+    # Check for doubled pawns, counting the pawns on every file
     for file in range(8):
-        white_count = white_files.count(file)
-        black_count = black_files.count(file)
+        file_mask = FILE_A << file
+        white_count = (white_pawns & file_mask).bit_count()
+        black_count = (black_pawns & file_mask).bit_count()
 
         if white_count > 1:
-            pawn_score -= 10 * (white_count - 1)
+            pawn_score -= DOUBLED_PAWN_PENALTY * (white_count - 1)
         if black_count > 1:
-            pawn_score += 10 * (black_count - 1)
+            pawn_score += DOUBLED_PAWN_PENALTY * (black_count - 1)
 
     return pawn_score
 
 
+# Knights in center are more mobile and also covers more squares.
+KNIGHT_CENTRALITY = [
+    int(max(0, 7 - (abs(sq // 8 - 3.5) + abs(sq % 8 - 3.5))) * 2) for sq in range(64)
+]
+
+
 # currently it is only woking for Knight but haver to implement other pieces functionality also.
 def evaluateMobility(gs):
     """Evaluate piece mobility"""
     mobility_score = 0
 
-    # Knights in center are more mobile and also covers more squares.
-    for row in range(8):
-        for col in range(8):
-            piece = gs.board[row][col]
-            # piece is a knight
-            if piece in ["wN", "bN"]:
-                center_distance = abs(row - 3.5) + abs(col - 3.5)
-                mobility_bonus = max(0, 7 - center_distance) * 2
-
-                if piece == "wN":
-                    mobility_score += mobility_bonus
-                else:
-                    mobility_score -= mobility_bonus
-
-            # if piece is a bishop
-            # if piece in ["wB", "bB"]:
+    for index, sign in ((PIECE_INDEX["wN"], 1), (PIECE_INDEX["bN"], -1)):
+        knights = gs.pieceBB[index]
+        while knights:
+            low = knights & -knights
+            knights ^= low
+            mobility_score += sign * KNIGHT_CENTRALITY[low.bit_length() - 1]
 
+    # if piece is a bishop
+    # if piece in ["wB", "bB"]:
 
-            # piece is a rook
-            # if piece in ["wR", "bR"]:
+    # piece is a rook
+    # if piece in ["wR", "bR"]:
 
-            # piece is a Queen
-            # if piece in ["wQ", "bQ"]:
+    # piece is a Queen
+    # if piece in ["wQ", "bQ"]:
 
     return mobility_score
+
+
+# Batched evaluation: boards are encoded as 64 small ints, 0 for an empty square
+# and PIECE_INDEX + 1 for a piece, one row per position.
+PIECE_CODES = {".": 0, **{name: index + 1 for name, index in PIECE_INDEX.items()}}
+SQUARES = np.arange(64)
+# signed (white positive) material + piece-square + knight centrality of each code
+# on each square, everything in scoreBoard that only depends on where a piece stands
+SQUARE_VALUES = np.zeros((13, 64), dtype=np.int32)
+for name, index in PIECE_INDEX.items():
+    for sq in range(64):
+        value = PIECE_SQUARE_VALUES[index][sq]
+        if name[1] == "N":
+            value += KNIGHT_CENTRALITY[sq]
+        SQUARE_VALUES[index + 1, sq] = value if name[0] == "w" else -value
+# move flags scoreBoards cannot handle as a plain from -> to
+SPECIAL_FLAGS = np.zeros(16, dtype=bool)
+SPECIAL_FLAGS[[KING_CASTLE, QUEEN_CASTLE, EN_PASSANT]] = True
+SPECIAL_FLAGS[PROMOTION:] = True
+
+
+def scoreBoards(gs, moves):
+    """scoreBoard of the position after each of `moves`, all in one vectorized pass.
+
+    The current board is encoded once and copied into one row per move, the moves
+    are applied with fancy indexing and every term is summed over the whole batch
+    at once instead of once per position in Python.
+    """
+    count = len(moves)
+    parent = np.fromiter(
+        (PIECE_CODES[piece] for row in gs.board for piece in row),
+        dtype=np.int8,
+        count=64,
+    )
+    boards = np.repeat(parent[np.newaxis, :], count, axis=0)
+
+    packed = np.array(moves, dtype=np.int32)
+    starts, ends, flags = packed & 63, packed >> 6 & 63, packed >> 12
+    rows = np.arange(count)
+    boards[rows, ends] = parent[starts]
+    boards[rows, starts] = 0
+
+    # promotions, en passant and castling rooks, few enough to do one at a time
+    extraRows, extraSquares, extraCodes = [], [], []
+    color = "w" if gs.white_to_move else "b"
+    for i in np.flatnonzero(SPECIAL_FLAGS[flags]).tolist():
+        flag, end = int(flags[i]), int(ends[i])
+        if flag & PROMOTION:
+            extraRows.append(i)
+            extraSquares.append(end)
+            extraCodes.append(PIECE_CODES[color + PROMOTION_CHOICES[flag & 3]])
+        elif flag == EN_PASSANT:
+            extraRows.append(i)
+            extraSquares.append(int(starts[i]) & ~7 | end & 7)
+            extraCodes.append(0)
+        else:
+            rook = PIECE_CODES[color + "R"]
+            if flag == KING_CASTLE:
+                rookFrom, rookTo = end + 1, end - 1
+            else:
+                rookFrom, rookTo = end - 2, end + 1
+            extraRows += [i, i]
+            extraSquares += [rookFrom, rookTo]
+            extraCodes += [0, rook]
+    if extraRows:
+        boards[extraRows, extraSquares] = extraCodes
+
+    scores = SQUARE_VALUES[boards, SQUARES].sum(axis=1)
+
+    # doubled pawns, pawns per file are column sums of the 8x8 view
+    files = boards.reshape(count, 8, 8)
+    whitePawns = (files == PIECE_CODES["wp"]).sum(axis=1)
+    blackPawns = (files == PIECE_CODES["bp"]).sum(axis=1)
+    scores -= DOUBLED_PAWN_PENALTY * np.maximum(whitePawns - 1, 0).sum(axis=1)
+    scores += DOUBLED_PAWN_PENALTY * np.maximum(blackPawns - 1, 0).sum(axis=1)
+
+    # king safety, same rule as evaluateKingSafety
+    exposed = (boards == PIECE_CODES["wK"]).argmax(axis=1) // 8 > 1
+    scores -= KING_SAFETY_PENALTY * exposed
+    exposed = (boards == PIECE_CODES["bK"]).argmax(axis=1) // 8 < 6
+    scores += KING_SAFETY_PENALTY * exposed
+
+    return scores.tolist()
@@ -0,0 +1,474 @@
+"""
+Endgame tablebases: the exact distance to mate of every position with a few
+pieces left (KQK, KRK, KPK, or any other 3 or 4 piece set).
+
+A table is built backwards from the mates (retrograde analysis). Every
+position of the set gets one byte:
+    0       draw
+    n + 1   mate in n plies with best play, odd n is a win for the side to
+            move, even n a loss (0: already checkmated)
+    255     not a position of the table (illegal, or a mirror image of one)
+
+The index of a position is a perfect hash of where its pieces stand: the white
+king square (folded by the board's symmetries into 10 squares, or 32 once there
+are pawns), then 6 bits per other piece, then the side to move. Tables are
+stored as that byte array in data/tablebases/<set>.dtm.
+
+    python Chess/tablebase.py              # KQK KRK KPK
+    python Chess/tablebase.py KQKR KRKP    # 4 pieces: 20 minutes and more each
+
+En passant and castling are left out, positions with either are not probed.
+"""
+
+import mmap
+import os
+import sys
+import time
+
+from attackTables import (
+    BISHOP_RAYS,
+    KING_ATTACKS,
+    KNIGHT_ATTACKS,
+    QUEEN_RAYS,
+    ROOK_RAYS,
+    sliderAttacks,
+)
+from config import CHECKMATE, STALEMATE
+from engine import (
+    CAPTURE,
+    PIECE_NAMES,
+    PROMOTION,
+    PROMOTION_CHOICES,
+    ZOBRIST_CASTLING,
+    State,
+)
+
+TABLE_DIR = os.path.join("Chess", "data", "tablebases")
+DEFAULT_SETS = ["KQK", "KRK", "KPK"]
+MAX_PIECES = 4
+
+DRAW, ILLEGAL = 0, 255
+PIECE_ORDER = "QRBNP"  # order of the pieces after the king in a set name
+
+# the 8 ways to turn or mirror the board, as square -> square maps
+SYMMETRIES = [
+    [
+        (sq & 7) << 3 | sq >> 3 if transpose else sq
+        for sq in [square ^ flip for square in range(64)]
+    ]
+    for flip in (0, 7, 56, 63)
+    for transpose in (False, True)
+]
+# with pawns only mirroring the files keeps the rules the same
+PAWN_SYMMETRIES = [list(range(64)), [sq ^ 7 for sq in range(64)]]
+# the white king is always moved into one of these squares
+PAWNLESS_KING_SQUARES = [r * 8 + c for r in range(4) for c in range(r, 4)]
+PAWN_KING_SQUARES = [r * 8 + c for r in range(8) for c in range(4)]
+
+SLIDER_RAYS = {"B": BISHOP_RAYS, "R": ROOK_RAYS, "Q": QUEEN_RAYS}
+
+
+class Tablebase:
+    """Distance to mate table of one material set, e.g. "KRK" or "KQKR"."""
+
+    def __init__(self, name, values=None):
+        self.name = name
+        white, black = name[1:].split("K")
+        # table order: both kings, then the white pieces, then the black ones
+        self.pieces = ["wK", "bK"]
+        self.pieces += ["w" + pieceName(letter) for letter in white]
+        self.pieces += ["b" + pieceName(letter) for letter in black]
+        # runs of identical pieces (KBBK), their squares are kept sorted
+        self.groups = []
+        start = 0
+        while start < len(self.pieces):
+            end = start + 1
+            while end < len(self.pieces) and self.pieces[end] == self.pieces[start]:
+                end += 1
+            if end - start > 1:
+                self.groups.append((start, end))
+            start = end
+        hasPawns = "P" in name
+        self.symmetries = PAWN_SYMMETRIES if hasPawns else SYMMETRIES
+        self.kingSquares = PAWN_KING_SQUARES if hasPawns else PAWNLESS_KING_SQUARES
+        self.kingRegion = {sq: i for i, sq in enumerate(self.kingSquares)}
+        self.size = len(self.kingSquares) * 64 ** (len(self.pieces) - 1) * 2
+        self.values = values
+
+    def index(self, squares, whiteToMove):
+        """Index of the position (piece squares in table order).
+
+        Of all mirror images with the white king in its region the smallest
+        index is taken, so every mirror image of a position gets the same one.
+        """
+        best = None
+        for symmetry in self.symmetries:
+            king = symmetry[squares[0]]
+            if king not in self.kingRegion:
+                continue
+            moved = [symmetry[sq] for sq in squares]
+            for start, end in self.groups:
+                moved[start:end] = sorted(moved[start:end])
+            index = self.kingRegion[king]
+            for sq in moved[1:]:
+                index = index * 64 + sq
+            if best is None or index < best:
+                best = index
+        return best * 2 + (0 if whiteToMove else 1)
+
+    def decode(self, index):
+        """Piece squares and side to move of an index."""
+        whiteToMove = not index & 1
+        index >>= 1
+        squares = []
+        for _ in range(len(self.pieces) - 1):
+            squares.append(index & 63)
+            index >>= 6
+        squares.append(self.kingSquares[index])
+        squares.reverse()
+        return squares, whiteToMove
+
+    def probe(self, pieces, whiteToMove):
+        """Byte of the position given as (piece, square) pairs."""
+        squares = {}
+        for piece, sq in pieces:
+            squares.setdefault(piece, []).append(sq)
+        ordered = [squares[piece].pop() for piece in self.pieces]
+        return self.values[self.index(ordered, whiteToMove)]
+
+    def save(self):
+        os.makedirs(TABLE_DIR, exist_ok=True)
+        with open(os.path.join(TABLE_DIR, self.name + ".dtm"), "wb") as out:
+            out.write(self.values)
+
+    def generate(self):
+        """Work out every value by retrograde analysis.
+
+        A forward pass over all positions finds the mates and everything that
+        captures or promotes into a smaller table (those are generated first).
+        Then the results spread backwards one ply at a time: the positions
+        that can move into a loss are wins, and a position is lost once every
+        move leads to a win for the other side.
+        """
+        for child in self.childSets():
+            if getTable(child) is None:
+                table = Tablebase(child)
+                table.generate()
+                table.save()
+                tables[child] = table
+
+        size = self.size
+        values = bytearray(size)
+        remaining = bytearray(size)  # moves in this table not yet known to lose
+        lossLevel = bytearray(size)  # longest loss a capture/promotion leads to
+        buckets = [[] for _ in range(ILLEGAL)]  # positions to settle, by plies
+        board = Board(self)
+
+        for index in range(size):
+            squares, whiteToMove = self.decode(index)
+            if not self.isValid(squares) or self.index(squares, whiteToMove) != index:
+                values[index] = ILLEGAL
+                continue
+            gs = board.setUp(squares, whiteToMove)
+            if board.isAttacked(not whiteToMove):
+                values[index] = ILLEGAL  # the side that just moved is in check
+                continue
+            moves = gs.getValidMoves()
+            if not moves:
+                if board.isAttacked(whiteToMove):
+                    buckets[0].append(index)  # checkmated
+                continue  # stalemate stays a draw
+
+            successors = set()
+            bestWin = None
+            color = "w" if whiteToMove else "b"
+            for move in moves:
+                start, end, flags = move & 63, move >> 6 & 63, move >> 12
+                if not flags & (CAPTURE | PROMOTION):
+                    moved = [end if sq == start else sq for sq in squares]
+                    successors.add(self.index(moved, not whiteToMove))
+                    continue
+                # leaves this table: look the result up in the smaller one
+                pieces = [
+                    (color + PROMOTION_CHOICES[flags & 3], end)
+                    if sq == start and flags & PROMOTION
+                    else (piece, end if sq == start else sq)
+                    for piece, sq in zip(self.pieces, squares)
+                    if sq != end
+                ]
+                value = probePieces(pieces, not whiteToMove)
+                if value is None:
+                    raise ValueError(f"{self.name}: no table for {pieces}")
+                if value == DRAW:
+                    lossLevel[index] = ILLEGAL  # never a loss
+                elif value % 2:  # the other side gets mated, a win in `value` plies
+                    bestWin = value if bestWin is None else min(bestWin, value)
+                    lossLevel[index] = ILLEGAL
+                elif lossLevel[index] != ILLEGAL:
+                    lossLevel[index] = max(lossLevel[index], value)
+            remaining[index] = len(successors)
+            if bestWin is not None:
+                buckets[bestWin].append(index)
+            elif not successors and lossLevel[index] != ILLEGAL:
+                buckets[lossLevel[index]].append(index)  # every move loses
+
+        for level, bucket in enumerate(buckets):
+            for index in bucket:
+                if values[index]:
+                    continue  # already settled at a lower level
+                values[index] = level + 1
+                squares, whiteToMove = self.decode(index)
+                for previous in board.unmoves(squares, whiteToMove):
+                    if values[previous]:
+                        continue
+                    if level % 2 == 0:
+                        # moving here mates the other side in `level` plies
+                        buckets[level + 1].append(previous)
+                        continue
+                    remaining[previous] -= 1
+                    if not remaining[previous] and lossLevel[previous] != ILLEGAL:
+                        buckets[max(level + 1, lossLevel[previous])].append(previous)
+        self.values = values
+
+    def isValid(self, squares):
+        if len(set(squares)) != len(squares):
+            return False
+        return all(
+            not (piece[1] == "p" and sq >> 3 in (0, 7))
+            for piece, sq in zip(self.pieces, squares)
+        )
+
+    def childSets(self):
+        """Sets reached by one capture or promotion, minus the trivial draws."""
+        children = set()
+        for i, piece in enumerate(self.pieces[2:], 2):
+            rest = self.pieces[:i] + self.pieces[i + 1 :]
+            children.add(setName(rest))
+            if piece[1] == "p":
+                for promoted in PIECE_ORDER[:4]:
+                    children.add(setName(rest + [piece[0] + promoted]))
+        return sorted(
+            {canonicalName(name) for name in children if not isDrawnSet(name)}
+        )
+
+
+class Board:
+    """A State that the generator moves pieces around on."""
+
+    def __init__(self, table):
+        self.table = table
+        self.gs = State("8/8/8/8/8/8/8/8 w - - 0 1")
+        self.squares = []
+
+    def setUp(self, squares, whiteToMove):
+        gs = self.gs
+        for sq in self.squares:
+            gs.removePiece(sq >> 3, sq & 7)
+        for piece, sq in zip(self.table.pieces, squares):
+            gs.putPiece(sq >> 3, sq & 7, piece)
+        gs.white_to_move = whiteToMove
+        self.squares = squares
+        return gs
+
+    def isAttacked(self, white):
+        """Is the king of this colour attacked?"""
+        king = self.squares[0 if white else 1]
+        return self.gs.isAttacked(king, 1 if white else 0)
+
+    def unmoves(self, squares, whiteToMove):
+        """Indices of the positions one non-capturing move before this one."""
+        table = self.table
+        gs = self.setUp(squares, whiteToMove)
+        color = "b" if whiteToMove else "w"  # the side that just moved
+        occupied = gs.occupied
+        previous = set()
+        for i, piece in enumerate(table.pieces):
+            if piece[0] != color:
+                continue
+            sq = squares[i]
+            kind = piece[1]
+            if kind == "K":
+                targets = KING_ATTACKS[sq]
+            elif kind == "N":
+                targets = KNIGHT_ATTACKS[sq]
+            elif kind == "p":
+                # a pawn came from behind, two squares if it now stands on its
+                # fourth rank, never from its own back rank
+                back = 8 if color == "w" else -8
+                targets = 0
+                origin = sq + back
+                if 8 <= origin < 56 and not occupied >> origin & 1:
+                    targets = 1 << origin
+                    if sq >> 3 == (4 if color == "w" else 3):
+                        origin += back
+                        if not occupied >> origin & 1:
+                            targets |= 1 << origin
+            else:
+                targets = sliderAttacks(sq, SLIDER_RAYS[kind], occupied)
+            targets &= ~occupied
+            while targets:
+                low = targets & -targets
+                targets ^= low
+                origin = low.bit_length() - 1
+                gs.removePiece(sq >> 3, sq & 7)
+                gs.putPiece(origin >> 3, origin & 7, piece)
+                # before the move the side to move now was not allowed to be in check
+                king = squares[0 if whiteToMove else 1]
+                legal = not gs.isAttacked(king, 1 if whiteToMove else 0)
+                gs.removePiece(origin >> 3, origin & 7)
+                gs.putPiece(sq >> 3, sq & 7, piece)
+                if legal:
+                    moved = squares[:i] + [origin] + squares[i + 1 :]
+                    previous.add(table.index(moved, not whiteToMove))
+        return previous
+
+
+def pieceName(letter):
+    return "p" if letter == "P" else letter
+
+
+def setName(pieces):
+    """"KQKR" style name of a list of piece names like ["wK", "bK", "wQ", "bR"]."""
+    sides = []
+    for color in "wb":
+        letters = [piece[1].upper() for piece in pieces if piece[0] == color]
+        letters.remove("K")
+        sides.append("K" + "".join(sorted(letters, key=PIECE_ORDER.index)))
+    return "".join(sides)
+
+
+def canonicalName(name):
+    """The name of the set or of its colour swap, whichever gives white more."""
+    white, black = name[1:].split("K")
+
+    def strength(side):
+        return len(side), [-PIECE_ORDER.index(letter) for letter in side]
+
+    return name if strength(white) >= strength(black) else "K" + black + "K" + white
+
+
+def isDrawnSet(name):
+    """Bare kings, or a single minor piece: nobody can ever be mated."""
+    rest = name.replace("K", "")
+    return len(rest) <= 1 and rest in ("", "B", "N")
+
+
+tables = {}  # loaded tables by name, None when there is no file
+
+
+def getTable(name):
+    if name not in tables:
+        try:
+            with open(os.path.join(TABLE_DIR, name + ".dtm"), "rb") as source:
+                try:
+                    values = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+                except (OSError, ValueError):
+                    values = source.read()  # no mmap (the browser build)
+            tables[name] = Tablebase(name, values)
+        except OSError:
+            tables[name] = None
+    return tables[name]
+
+
+def probePieces(pieces, whiteToMove):
+    """Byte for a position given as (piece, square) pairs, None without a table."""
+    name = setName([piece for piece, _ in pieces])
+    if isDrawnSet(name):
+        return DRAW
+    table = getTable(name)
+    if table is None:
+        # the same ending with the colours swapped: flip the board upside down
+        white, black = name[1:].split("K")
+        table = getTable("K" + black + "K" + white)
+        if table is None:
+            return None
+        pieces = [
+            (("b" if piece[0] == "w" else "w") + piece[1], sq ^ 56)
+            for piece, sq in pieces
+        ]
+        whiteToMove = not whiteToMove
+    value = table.probe(pieces, whiteToMove)
+    return None if value == ILLEGAL else value
+
+
+def probe(gs):
+    """Byte for the position in `gs`, or None when no table covers it."""
+    # the state key is the bare no-castling key unless there are castling
+    # rights or an en passant capture, which the tables know nothing about
+    if (
+        gs.occupied.bit_count() > MAX_PIECES
+        or gs.getStateKey() != ZOBRIST_CASTLING[0]
+    ):
+        return None
+    pieces = []
+    for index, bb in enumerate(gs.pieceBB):
+        while bb:
+            low = bb & -bb
+            bb ^= low
+            pieces.append((PIECE_NAMES[index], low.bit_length() - 1))
+    return probePieces(pieces, gs.white_to_move)
+
+
+def probeScore(gs):
+    """Exact score of the position for the side to move, None without a table.
+
+    Mates are scored like the search does, CHECKMATE minus the plies to go
+    from this position.
+    """
+    value = probe(gs)
+    if value is None:
+        return None
+    if value == DRAW:
+        return STALEMATE
+    plies = value - 1
+    return CHECKMATE - plies if plies % 2 else -CHECKMATE + plies
+
+
+def bestMove(gs, validMoves):
+    """The move with the best tablebase result: the quickest mate when winning,
+    the longest defence when losing. None when a table is missing."""
+    best = None
+    bestScore = None
+    for move in validMoves:
+        gs.makeMove(move)
+        score = probeScore(gs)
+        gs.undoMove()
+        if score is None:
+            return None
+        score = -score
+        # one ply further from the mate than the position after the move
+        if score > STALEMATE:
+            score -= 1
+        elif score < STALEMATE:
+            score += 1
+        if bestScore is None or score > bestScore:
+            best, bestScore = move, score
+    return best
+
+
+def generateSets(names):
+    for name in names:
+        start = time.perf_counter()
+        table = Tablebase(name)
+        table.generate()
+        table.save()
+        tables[name] = table
+        counts = [0, 0, 0]  # wins, losses, draws for the side to move
+        longest = 0
+        for value in table.values:
+            if value == ILLEGAL:
+                continue
+            if value == DRAW:
+                counts[2] += 1
+            else:
+                counts[value % 2] += 1  # odd bytes are even plies: losses
+                longest = max(longest, value - 1)
+        print(
+            f"{name}: {sum(counts)} positions, {counts[0]} won, {counts[1]} lost, "
+            f"{counts[2]} drawn, longest mate {(longest + 1) // 2} moves "
+            f"({time.perf_counter() - start:.1f}s)"
+        )
+
+
+if __name__ == "__main__":
+    generateSets(sys.argv[1:] or DEFAULT_SETS)
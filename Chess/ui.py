@@ -4,113 +4,213 @@ import os
 import pygame as p
 from config import ANIMATION_DURATION, DIMENSION, HEIGHT, SQUARE_SIZE, WIDTH
 
+# SysFont has to find and load the font file, so every font is made only once,
+# and so is every piece of text rendered with one
+fonts = {}
+texts = {}
+
+
+def get_font(name, size) -> p.font.Font:
+    """p.font.SysFont(name, size), loaded on first use."""
+    if (name, size) not in fonts:
+        fonts[name, size] = p.font.SysFont(name, size)
+    return fonts[name, size]
+
+
+def render_text(text, name, size) -> p.Surface:
+    """`text` rendered in black with the font `name` at `size`, cached."""
+    if (text, name, size) not in texts:
+        texts[text, name, size] = get_font(name, size).render(
+            text, True, p.Color("black")
+        )
+    return texts[text, name, size]
+
 
 def load_images() -> dict[str, p.Surface]:
-    """Load and return scaled chess piece images."""
+    """Load and return scaled chess piece images.
+
+    They are converted to the screen's pixel format so blitting them needs no
+    conversion, which means the display mode has to be set before this is called.
+    """
     pieces = ["wB", "wK", "wN", "wp", "wQ", "wR", "bB", "bK", "bN", "bp", "bQ", "bR"]
     images = {}
     for piece in pieces:
         path = os.path.join("Chess", "images", f"{piece}.png")
         images[piece] = p.transform.scale(
             p.image.load(path), (SQUARE_SIZE, SQUARE_SIZE)
-        )
+        ).convert_alpha()
     return images
 
 
-def draw_game_state(
-    screen,
-    board,
-    images,
-    selected_sq,
-    valid_moves,
-    gs,
-    animating_move=None,
-    animation_progress=0,
-) -> None:
-    draw_board(screen)
-    draw_labels(screen, p.font.SysFont("Arial", 18))
-    highlight_squares(screen, selected_sq, valid_moves, gs)
-
-    # Draw pieces with animation
-    if animating_move:
-        draw_pieces_with_animation(
-            screen, board, images, animating_move, animation_progress
+def square_rect(r, c) -> p.Rect:
+    return p.Rect(c * SQUARE_SIZE, r * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
+
+
+def make_overlay(color, size=(SQUARE_SIZE, SQUARE_SIZE)) -> p.Surface:
+    """A see-through surface of `color` for highlighting."""
+    overlay = p.Surface(size).convert()
+    overlay.fill(p.Color(color))
+    overlay.set_alpha(100)
+    return overlay
+
+
+class BoardRenderer:
+    """Draws the game on `screen`, redrawing only what changed since the last frame.
+
+    The board and its labels are drawn once onto a background surface. Every
+    frame each square is described by what it shows (its piece and highlights),
+    and only the squares whose description changed are drawn again from the
+    background. draw returns their rects for p.display.update, so a frame where
+    nothing changed costs no blits and no screen update at all.
+    """
+
+    def __init__(self, screen, images):
+        self.screen = screen
+        self.images = images
+        self.background = p.Surface(screen.get_size()).convert()
+        draw_board(self.background)
+        draw_labels(self.background, get_font("Arial", 18))
+        self.selected_overlay = make_overlay("blue")
+        self.target_overlay = make_overlay("yellow")
+        self.check_overlay = make_overlay("red")
+        self.game_over_overlay = make_overlay("green", (WIDTH, HEIGHT))
+        self.squares = [None] * 64  # what every square showed in the last frame
+        self.message = None  # game over text shown over the board, if any
+
+    def invalidate(self) -> None:
+        """Draw everything again next frame, after something else drew on the screen."""
+        self.squares = [None] * 64
+
+    def draw(self, board, selected_sq, valid_moves, gs) -> list[p.Rect]:
+        """Bring the screen up to date with the game, returns the rects that changed."""
+        selected = -1
+        targets = set()
+        if selected_sq:
+            selected = selected_sq[0] * 8 + selected_sq[1]
+            for move in valid_moves:  # packed ints, the start square is the low 6 bits
+                if move & 63 == selected:
+                    targets.add(move >> 6 & 63)
+
+        _, in_check, status = gs.getStatus()  # cached, no move generation per frame
+        king = -1
+        if in_check:
+            king_row, king_col = (
+                gs.whiteKingLoc if gs.white_to_move else gs.blackKingLoc
+            )
+            king = king_row * 8 + king_col
+
+        squares = [
+            (board[sq >> 3][sq & 7], sq == selected, sq in targets, sq == king)
+            for sq in range(64)
+        ]
+        message = None
+        if status == "checkmate":
+            winner = "White" if not gs.white_to_move else "Black"
+            message = ("Checkmate! " + winner + " wins", 40)
+        elif status == "stalemate":
+            message = ("Stalemate!", 50)
+
+        if message != self.message or (message and squares != self.squares):
+            # the game over message lies over every square, so everything is redrawn
+            for sq in range(64):
+                self.draw_square(sq, squares[sq])
+            if message:
+                self.draw_message(*message)
+            self.squares = squares
+            self.message = message
+            return [self.screen.get_rect()]
+
+        dirty = []
+        for sq in range(64):
+            if squares[sq] != self.squares[sq]:
+                dirty.append(self.draw_square(sq, squares[sq]))
+        self.squares = squares
+        return dirty
+
+    def draw_square(self, sq, square) -> p.Rect:
+        """Draw one square: background, highlights, then the piece on it."""
+        piece, selected, target, check = square
+        rect = square_rect(sq >> 3, sq & 7)
+        screen = self.screen
+        screen.blit(self.background, rect, rect)
+        if selected:
+            screen.blit(self.selected_overlay, rect)
+        if target:
+            screen.blit(self.target_overlay, rect)
+        if check:
+            screen.blit(self.check_overlay, rect)
+        if piece != ".":
+            screen.blit(self.images[piece], rect)
+        return rect
+
+    def draw_message(self, text, size) -> None:
+        self.screen.blit(self.game_over_overlay, (0, 0))
+        text = render_text(text, "Times New Roman", size)
+        self.screen.blit(
+            text,
+            (WIDTH // 2 - text.get_width() // 2, HEIGHT // 2 - text.get_height() // 2),
         )
-    else:
-        draw_pieces(screen, board, images)
-
-
-def animate_move(screen, board, images, move, gs, clock):
-    """Animate a chess move from start to end position."""
-    start_time = p.time.get_ticks()
-
-    # Calculate start and end positions in pixels
-    start_x = move.startCol * SQUARE_SIZE
-    start_y = move.startRow * SQUARE_SIZE
-    end_x = move.endCol * SQUARE_SIZE
-    end_y = move.endRow * SQUARE_SIZE
 
-    # Store the piece being moved
-    piece = move.pieceMoved
+    def animate_move(self, board, move, clock) -> None:
+        """Animate a chess move from start to end position.
 
-    # Temporarily remove piece from board for animation
-    temp_board = board.copy()
-    temp_board[move.startRow][move.startCol] = "."
-
-    while True:
-        current_time = p.time.get_ticks()
-        elapsed = current_time - start_time
-
-        if elapsed >= ANIMATION_DURATION:
-            break
-
-        # Calculate animation progress (0 to 1)
-        progress = elapsed / ANIMATION_DURATION
-        # Use easing function for smoother animation
-        progress = ease_in_out(progress)
-
-        # Calculate current position
-        current_x = start_x + (end_x - start_x) * progress
-        current_y = start_y + (end_y - start_y) * progress
-
-        # Draw everything
-        draw_board(screen)
-        draw_labels(screen, p.font.SysFont("Arial", 18))
-
-        # Draw all pieces except the moving one
-        draw_pieces(screen, temp_board, images)
-
-        # Draw the moving piece at current position
-        screen.blit(images[piece], (current_x, current_y))
-
-        # Handle special moves during animation
+        The board without the moving pieces is drawn once, after that each frame
+        only restores, draws and updates the rects the pieces leave and enter.
+        """
+        sprites = [
+            (
+                move.pieceMoved,
+                (move.startCol * SQUARE_SIZE, move.startRow * SQUARE_SIZE),
+                (move.endCol * SQUARE_SIZE, move.endRow * SQUARE_SIZE),
+            )
+        ]
+        # Temporarily remove piece from board for animation
+        temp_board = [row[:] for row in board]
+        temp_board[move.startRow][move.startCol] = "."
         if move.isCastleMove:
-            animate_castling_rook(screen, images, move, progress)
-
-        p.display.flip()
-        clock.tick(60)  # 60 FPS for smooth animation
-
-
-def animate_castling_rook(screen, images, move, progress):
-    """Animate the rook movement during castling."""
-    if move.endCol - move.startCol == 2:  # King side castle
-        rook_start_col = 7
-        rook_end_col = 5
-    else:  # Queen side castle
-        rook_start_col = 0
-        rook_end_col = 3
-
-    rook_piece = "wR" if move.pieceMoved == "wK" else "bR"
-
-    # Calculate rook positions
-    rook_start_x = rook_start_col * SQUARE_SIZE
-    rook_end_x = rook_end_col * SQUARE_SIZE
-    rook_y = move.startRow * SQUARE_SIZE
-
-    # Current rook position
-    current_rook_x = rook_start_x + (rook_end_x - rook_start_x) * progress
+            # the rook jumps over the king at the same time
+            if move.endCol - move.startCol == 2:  # King side castle
+                rook_start_col, rook_end_col = 7, 5
+            else:  # Queen side castle
+                rook_start_col, rook_end_col = 0, 3
+            temp_board[move.startRow][rook_start_col] = "."
+            rook_y = move.startRow * SQUARE_SIZE
+            sprites.append(
+                (
+                    move.pieceMoved[0] + "R",
+                    (rook_start_col * SQUARE_SIZE, rook_y),
+                    (rook_end_col * SQUARE_SIZE, rook_y),
+                )
+            )
+        still = self.background.copy()
+        draw_pieces(still, temp_board, self.images)
+
+        self.screen.blit(still, (0, 0))
+        previous = [self.screen.get_rect()]  # the first frame shows everything
+        start_time = p.time.get_ticks()
+        while True:
+            elapsed = p.time.get_ticks() - start_time
+            if elapsed >= ANIMATION_DURATION:
+                break
+
+            # Use easing function for smoother animation
+            progress = ease_in_out(elapsed / ANIMATION_DURATION)
+            for rect in previous:
+                self.screen.blit(still, rect, rect)
+            current = []
+            for piece, (start_x, start_y), (end_x, end_y) in sprites:
+                rect = square_rect(0, 0)
+                rect.topleft = (
+                    round(start_x + (end_x - start_x) * progress),
+                    round(start_y + (end_y - start_y) * progress),
+                )
+                self.screen.blit(self.images[piece], rect)
+                current.append(rect)
+            p.display.update(previous + current)
+            previous = current
+            clock.tick(60)  # 60 FPS for smooth animation
 
-    screen.blit(images[rook_piece], (current_rook_x, rook_y))
+        self.invalidate()  # the squares on screen are not what draw last left
 
 
 def ease_in_out(t):
@@ -124,11 +224,7 @@ def draw_board(screen) -> None:
     for r in range(DIMENSION):
         for c in range(DIMENSION):
             color = colors[(r + c) & 1]
-            p.draw.rect(
-                screen,
-                color,
-                p.Rect(c * SQUARE_SIZE, r * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE),
-            )
+            p.draw.rect(screen, color, square_rect(r, c))
 
 
 def draw_pieces(screen, board, images) -> None:
@@ -137,87 +233,7 @@ def draw_pieces(screen, board, images) -> None:
         for c in range(DIMENSION):
             piece = board[r][c]
             if piece != ".":
-                rect = p.Rect(
-                    c * SQUARE_SIZE, r * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE
-                )
-                screen.blit(images[piece], rect)
-
-
-def draw_pieces_with_animation(screen, board, images, animating_move, progress):
-    """Draw pieces with one piece being animated."""
-    for r in range(DIMENSION):
-        for c in range(DIMENSION):
-            piece = board[r][c]
-            if piece != "." and not (
-                r == animating_move.startRow and c == animating_move.startCol
-            ):
-                rect = p.Rect(
-                    c * SQUARE_SIZE, r * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE
-                )
-                screen.blit(images[piece], rect)
-
-    # Draw the animating piece
-    start_x = animating_move.startCol * SQUARE_SIZE
-    start_y = animating_move.startRow * SQUARE_SIZE
-    end_x = animating_move.endCol * SQUARE_SIZE
-    end_y = animating_move.endRow * SQUARE_SIZE
-
-    current_x = start_x + (end_x - start_x) * progress
-    current_y = start_y + (end_y - start_y) * progress
-
-    screen.blit(images[animating_move.pieceMoved], (current_x, current_y))
-
-
-def highlight_squares(screen, selected_sq, valid_moves, gs) -> None:
-    """Highlight selected square, valid moves, and game state indicators."""
-    if selected_sq:
-        r, c = selected_sq
-        s = p.Surface((SQUARE_SIZE, SQUARE_SIZE))
-        s.set_alpha(100)
-        s.fill(p.Color("blue"))
-        screen.blit(s, (c * SQUARE_SIZE, r * SQUARE_SIZE))
-
-        s.fill(p.Color("yellow"))
-        for move in valid_moves:
-            if move.startRow == r and move.startCol == c:
-                er = move.endRow
-                ec = move.endCol
-                screen.blit(s, (ec * SQUARE_SIZE, er * SQUARE_SIZE))
-
-    if gs.inCheck():
-        king_row, king_col = gs.whiteKingLoc if gs.white_to_move else gs.blackKingLoc
-        s = p.Surface((SQUARE_SIZE, SQUARE_SIZE))
-        s.set_alpha(100)
-        s.fill(p.Color("red"))
-        screen.blit(s, (king_col * SQUARE_SIZE, king_row * SQUARE_SIZE))
-
-    if gs.checkMate() == "checkmate":
-        s = p.Surface((WIDTH, HEIGHT))
-        s.set_alpha(100)
-        s.fill(p.Color("green"))
-        screen.blit(s, (0, 0))
-        text = p.font.SysFont("Times New Roman", 40).render(
-            "Checkmate! " + ("White" if not gs.white_to_move else "Black") + " wins",
-            True,
-            p.Color("black"),
-        )
-        screen.blit(
-            text,
-            (WIDTH // 2 - text.get_width() // 2, HEIGHT // 2 - text.get_height() // 2),
-        )
-
-    if gs.checkMate() == "stalemate":
-        s = p.Surface((WIDTH, HEIGHT))
-        s.set_alpha(100)
-        s.fill(p.Color("green"))
-        screen.blit(s, (0, 0))
-        text = p.font.SysFont("Times New Roman", 50).render(
-            "Stalemate!", True, p.Color("black")
-        )
-        screen.blit(
-            text,
-            (WIDTH // 2 - text.get_width() // 2, HEIGHT // 2 - text.get_height() // 2),
-        )
+                screen.blit(images[piece], square_rect(r, c))
 
 
 def draw_labels(screen, font) -> None: